@@ -3,6 +3,12 @@ __project__ = 'spoc-file-processing'
 
 import utilsSPOC as utils
 
+# count variables, in the order of their columns
+COUNT_FIELDS = [utils.COL_NUM_LEGIT_COMMENTS, utils.LATE_COMMENTS, utils.BEFORE_EXP_COMMENTS, utils.COL_HELP_REQS,
+                utils.LIWC_POSITIVE, utils.LIWC_NEGATIVE, utils.COMMENT_WORDS, utils.COMMENT_CHARS,
+                utils.COL_COMMENTS_BEFORE_PROMPT, utils.COL_COMMENTS_AFTER_PROMPT, utils.COL_COMMENTS_WEEK_BEFORE,
+                utils.COL_COMMENTS_WEEK_AFTER, utils.COL_COMMENTS_DAYS_AFTER]
+
 class UserSPOC(object):
     """
     The UserSPOC class represents a single user
@@ -24,6 +30,7 @@ class UserSPOC(object):
     exercises = []
 
     first_prompt_date = ""
+    _const_columns = None  # cached const_columns(), see clear_const_columns()
 
     # user counting
     num_punctual_comments = 0  # some students post comments waaaaay after the lecture is posted, keep track of legitimate comment count!
@@ -111,22 +118,7 @@ class UserSPOC(object):
         :param delimiter: character to split each column
         :return: a string for printing non-count variables from this UserSPOC object
         """
-        line = str(self.user_id) + delimiter + str(self.num_comments) + delimiter
-        line += self.voting_cond + delimiter
-        line += self.any_vote_condition + delimiter + self.neg_vote_condition + delimiter
-        line += self.prompting_cond + delimiter + str(self.num_prompts) + delimiter
-        line += str(self.num_upvotes) + delimiter
-        line += str(self.num_downvotes)
-        for i in range(0, len(utils.COL_ASSIGNMENTS)):  # iterating through assignment scores
-            line += delimiter + self.assignments[i] + delimiter + self.assignment_lates[i]
-        line += delimiter + self.tot_late
-        for exam in self.exams:  # iterating through exam scores
-            line += delimiter + exam
-        line += delimiter + self.midgrade
-        for exc in self.exercises:  # iterating through exercise headers
-            line += delimiter + exc
-        line += delimiter + str(self.first_prompt_date)
-        return line
+        return delimiter.join(self.const_columns())
 
     def to_count_string(self, delimiter):
         """
@@ -134,20 +126,86 @@ class UserSPOC(object):
         :param delimiter: character to split each column
         :return: a string for printing this UserSPOC, coordinating with the headers
         """
-        line = str(self.num_punctual_comments) + delimiter + str(self.num_late_comments)
-        line += delimiter + str(self.num_comments_before_experiment)
-        line += delimiter + str(self.num_help_requests)
-        line += delimiter + str(self.liwc_positive_words)
-        line += delimiter + str(self.liwc_negative_words)
-        line += delimiter + str(self.num_comment_words)
-        line += delimiter + str(self.comment_length)
-        line += delimiter + str(self.comments_before_prompt)
-        line += delimiter + str(self.comments_after_prompt)
-        line += delimiter + str(self.comments_week_before_prompt)
-        line += delimiter + str(self.comments_week_after_prompt)
-        line += delimiter + str(self.comments_days_after_prompt)
+        return delimiter.join(self.count_columns())
+
+    def to_list(self):
+        """
+        Create a list of all UserSPOC variables, one per column
+        :return: a list of strings, coordinating with the headers
+        """
+        return list(self.const_columns()) + self.count_columns()
+
+    def const_columns(self):
+        """
+        The constant/non-count variables, one per column. Built once and cached, since they're written
+        out with every one of the user's comments. (Call clear_const_columns() after changing any of them.)
+        :return: a tuple of strings
+        """
+        if self._const_columns is None:
+            self._const_columns = tuple(self.build_const_columns())
+        return self._const_columns
+
+    def clear_const_columns(self):
+        """
+        Forget the cached const_columns(), after changing a constant variable
+        :return: None
+        """
+        self._const_columns = None
+
+    def build_const_columns(self):
+        """
+        Create a list of the constant/non-count variables, one per column
+        :return: a list of strings
+        """
+        line = [str(self.user_id), str(self.num_comments)]
+        line += [self.voting_cond]
+        line += [self.any_vote_condition, self.neg_vote_condition]
+        line += [self.prompting_cond, str(self.num_prompts)]
+        line += [str(self.num_upvotes)]
+        line += [str(self.num_downvotes)]
+        for i in range(0, len(utils.COL_ASSIGNMENTS)):  # iterating through assignment scores
+            line += [self.assignments[i], self.assignment_lates[i]]
+        line += [self.tot_late]
+        for exam in self.exams:  # iterating through exam scores
+            line += [exam]
+        line += [self.midgrade]
+        for exc in self.exercises:  # iterating through exercise headers
+            line += [exc]
+        line += [str(self.first_prompt_date)]
         return line
 
+    def count_columns(self):
+        """
+        Create a list of only the variables that are counts (from comments, usually), one per column
+        :return: a list of strings
+        """
+        return [str(getattr(self, field)) for field in COUNT_FIELDS]
+
+    def counts(self):
+        """
+        This user's counts as a partial aggregate, which can be added to another user's counts
+        (see add_counts) in any order and grouping
+        :return: dict of count variable name -> count, or "" if it can't be counted (no first prompt)
+        """
+        return {field: getattr(self, field) for field in COUNT_FIELDS}
+
+    def clear_counts(self):
+        """
+        Reset all counts to zero, e.g., to count only the comments in one shard of the logfiles
+        :return: None
+        """
+        for field in COUNT_FIELDS:
+            setattr(self, field, 0)
+
+    def add_counts(self, counts):
+        """
+        Add counts from some of this user's comments to this user's counts
+        :param counts: dict of count variable name -> count, or "" if it can't be counted (no first prompt)
+        :return: None
+        """
+        for field, count in counts.items():
+            setattr(self, field, add_count(getattr(self, field), count))
+
     @staticmethod
     def get_headers(delimiter):
         """
@@ -185,3 +243,29 @@ class UserSPOC(object):
         line += delimiter + utils.COL_COMMENTS_DAYS_AFTER
         return line
 
+
+def merge_counts(partial, other):
+    """
+    Combine two partial aggregates of users' counts (e.g., from two shards of the comments logfile)
+    :param partial: dict uid -> counts dict (see UserSPOC.counts), updated in place
+    :param other: dict uid -> counts dict
+    :return: partial
+    """
+    for uid, counts in other.items():
+        if uid not in partial:
+            partial[uid] = dict(counts)
+            continue
+        for field, count in counts.items():
+            partial[uid][field] = add_count(partial[uid].get(field, 0), count)
+    return partial
+
+def add_count(current, count):
+    """
+    Add two counts. Associative, so shards' counts can be added in any grouping for the same total.
+    :param current: a count, or "" if it can't be counted
+    :param count: a count, or "" if it can't be counted
+    :return: the sum, or "" if either can't be counted (once a count is blank, it stays blank)
+    """
+    if current == "" or count == "":
+        return ""
+    return current + count
@@ -0,0 +1,133 @@
+__author__ = 'IH'
+__project__ = 'spoc-file-processing'
+
+"""
+This aggregateSPOC file collects the features of each counted comment into a table, then computes
+every user's comment counts at once with grouped pandas/NumPy operations, instead of updating
+the user's counts one comment at a time
+"""
+
+import datetime
+import numpy as np
+import utilsSPOC as utils
+
+# why a comment was counted
+BEFORE_EXPERIMENT = 0  # posted before the experiment started
+LATE = 1  # posted too long after its lecture
+PUNCTUAL = 2  # posted near its lecture, during the experiment
+
+# the counts computed for each user: how many comments had each status, and sums over the punctual comments
+STATUS_COUNTS = [(utils.BEFORE_EXP_COMMENTS, BEFORE_EXPERIMENT), (utils.LATE_COMMENTS, LATE), (utils.COL_NUM_LEGIT_COMMENTS, PUNCTUAL)]
+FEATURE_SUMS = [(utils.COL_HELP_REQS, "is_help_request"), (utils.LIWC_POSITIVE, "num_positive"), (utils.LIWC_NEGATIVE, "num_negative"),
+                (utils.COMMENT_CHARS, "num_chars"), (utils.COMMENT_WORDS, "num_words")]
+PROMPT_COUNTS = [utils.COL_COMMENTS_BEFORE_PROMPT, utils.COL_COMMENTS_AFTER_PROMPT, utils.COL_COMMENTS_WEEK_BEFORE,
+                 utils.COL_COMMENTS_WEEK_AFTER, utils.COL_COMMENTS_DAYS_AFTER]
+BLANK_WITHOUT_PROMPT = [utils.COL_COMMENTS_BEFORE_PROMPT, utils.COL_COMMENTS_AFTER_PROMPT, utils.COL_COMMENTS_WEEK_BEFORE,
+                        utils.COL_COMMENTS_WEEK_AFTER]  # left blank for users who comment but never got a prompt
+
+class CommentTable(object):
+    """
+    The features of every counted comment, collected column by column as the comments file is read
+    """
+    def __init__(self):
+        self.user_ids = []
+        self.statuses = []
+        self.timestamps = []
+        self.help_requests = []
+        self.positive = []
+        self.negative = []
+        self.chars = []
+        self.words = []
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def add(self, user_id, status, datestamp=None, is_help_request=False, num_positive=0, num_negative=0, num_chars=0, num_words=0):
+        """
+        Add one comment to the table. Only punctual comments need their features.
+        :param user_id: id of the user who posted the comment
+        :param status: BEFORE_EXPERIMENT, LATE or PUNCTUAL
+        :param datestamp: datetime the comment was posted
+        :param is_help_request: True if the comment asks for help
+        :param num_positive: number of LIWC positive words in the comment
+        :param num_negative: number of LIWC negative words in the comment
+        :param num_chars: length of the comment
+        :param num_words: number of words in the comment
+        :return: None
+        """
+        self.user_ids.append(user_id)
+        self.statuses.append(status)
+        self.timestamps.append(datestamp)
+        self.help_requests.append(is_help_request)
+        self.positive.append(num_positive)
+        self.negative.append(num_negative)
+        self.chars.append(num_chars)
+        self.words.append(num_words)
+
+    def to_frame(self):
+        """
+        :return: pandas data frame with one row per comment
+        """
+        import pandas as pd
+        return pd.DataFrame({
+            "user_id": pd.Series(self.user_ids, dtype=object),
+            "status": np.array(self.statuses, dtype=np.int8),
+            "timestamp": pd.to_datetime(pd.Series(self.timestamps, dtype=object)),
+            "is_help_request": np.array(self.help_requests, dtype=bool),
+            "num_positive": np.array(self.positive, dtype=np.int64),
+            "num_negative": np.array(self.negative, dtype=np.int64),
+            "num_chars": np.array(self.chars, dtype=np.int64),
+            "num_words": np.array(self.words, dtype=np.int64)})
+
+def count_comments(table, users):
+    """
+    Compute the comment counts of every user in the table
+    :param table: CommentTable
+    :param users: dict uid -> UserSPOC, for each user's first prompt date
+    :return: dict uid -> {count variable name -> count, or "" if it can't be counted}
+    """
+    import pandas as pd
+    data = table.to_frame()
+    if len(data) == 0:
+        return {}
+    uids = pd.Index(data["user_id"].unique())
+    counts = pd.DataFrame(index=uids)
+
+    statuses = data.groupby(["user_id", "status"]).size().unstack(fill_value=0)
+    for field, status in STATUS_COUNTS:
+        counts[field] = statuses[status].reindex(uids, fill_value=0) if status in statuses.columns else 0
+
+    punctual = data[data["status"] == PUNCTUAL]
+    sums = punctual.groupby("user_id")[[column for field, column in FEATURE_SUMS]].sum().reindex(uids, fill_value=0)
+    for field, column in FEATURE_SUMS:
+        counts[field] = sums[column].astype(np.int64)
+
+    # join each punctual comment with its user's first prompt date
+    first_prompts = pd.Series({uid: usr.first_prompt_date for uid, usr in users.items() if isinstance(usr.first_prompt_date, datetime.datetime)}, dtype="datetime64[ns]")
+    first_prompt = punctual["user_id"].map(first_prompts)
+    days = (punctual["timestamp"].dt.normalize() - first_prompt.dt.normalize()).dt.days  # NaN without a first prompt, so every test below is False
+    positions = pd.DataFrame({
+        utils.COL_COMMENTS_BEFORE_PROMPT: punctual["timestamp"] < first_prompt,
+        utils.COL_COMMENTS_AFTER_PROMPT: punctual["timestamp"] >= first_prompt,
+        utils.COL_COMMENTS_WEEK_BEFORE: (days >= -7) & (days < 0),  # same windows as logfileSPOC.is_on_posted()
+        utils.COL_COMMENTS_WEEK_AFTER: (days >= 0) & (days <= 7),
+        utils.COL_COMMENTS_DAYS_AFTER: (days >= 0) & (days <= 3),
+        "user_id": punctual["user_id"]})
+    prompt_counts = positions.groupby("user_id")[PROMPT_COUNTS].sum().reindex(uids, fill_value=0)
+    for field in PROMPT_COUNTS:
+        counts[field] = prompt_counts[field].astype(np.int64)
+
+    counts = counts.astype(object)
+    no_prompt = (counts[utils.COL_NUM_LEGIT_COMMENTS] > 0) & ~uids.isin(first_prompts.index)
+    counts.loc[no_prompt, BLANK_WITHOUT_PROMPT] = ""
+    return {uid: {field: value if value == "" else int(value) for field, value in row.items()} for uid, row in counts.iterrows()}
+
+def add_counts(table, users):
+    """
+    Add the comment counts from the table to each user's counts
+    :param table: CommentTable
+    :param users: dict uid -> UserSPOC
+    :return: None
+    """
+    for uid, counts in count_comments(table, users).items():
+        users[uid].add_counts(counts)
@@ -0,0 +1,195 @@
+__author__ = 'IH'
+__project__ = 'spoc-file-processing'
+
+"""
+This benchmarkSPOC file runs each stage of logfileSPOC, LDA training and inference, and LIWC
+sentiment counting on synthetic logfiles (see syntheticSPOC) at increasing scales, recording rows
+per second and peak memory at each scale. Results can be saved as a JSON baseline and compared
+against a later run to catch slowdowns.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import utilsSPOC as utils
+import syntheticSPOC
+import profileSPOC
+import consentSPOC
+import logfileSPOC
+import liwc as liwc
+from topicModelLDA import LDAtopicModel as ldat
+
+SCALES = [1000, 10000, 100000]
+
+def measure(name, function, rows, reset=None):
+    """
+    Run a function twice: once to time it, then again under tracemalloc for its peak memory,
+    which would slow down the timed run
+    :param name: name of what's being measured
+    :param function: function to call, with no arguments
+    :param rows: number of rows (comments, documents, etc.) the function processes
+    :param reset: function to call, untimed, before each run, so the second starts from the same state
+    :return: (dict of the measurements, the function's return value from the timed run) tuple
+    """
+    if reset is not None:
+        reset()
+    started = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - started
+
+    if reset is not None:
+        reset()
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    measurement = {"name": name, "seconds": round(seconds, 6), "rows": rows,
+                   "rows_per_second": round(rows / seconds, 1) if seconds > 0 else None, "peak_bytes": peak}
+    print("\t" + name + ": " + "{:.3f}".format(seconds) + "s, " + str(rows) + " rows, peak " + "{:.1f}".format(peak / 2**20) + " MB")
+    return measurement, result
+
+def benchmark(num_comments, directory, seed=0, streaming=False):
+    """
+    Write synthetic logfiles with the given number of comments and measure every stage on them
+    :param num_comments: number of comments
+    :param directory: empty directory to write the logfiles and outputs to
+    :param seed: random seed for the synthetic logfiles
+    :param streaming: process the comments with logfileSPOC.is_streaming
+    :return: dict with the scale and a list of measurements
+    """
+    print("Benchmarking " + str(num_comments) + " comments in " + directory)
+    synthetic = syntheticSPOC.SyntheticSPOC(num_comments, seed=seed)
+    filenames = synthetic.write(directory)
+
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        # logfileSPOC keeps its state in module variables: start each scale from scratch
+        logfileSPOC.all_users = {}
+        logfileSPOC.is_only_second_half = False
+        logfileSPOC.is_streaming = streaming
+        logfileSPOC.num_workers = 1
+        logfileSPOC.output_format = "csv"
+        logfileSPOC.consent = consentSPOC.ConsentRegistry(dropped=[], roster_file=filenames["roster"])
+        logfileSPOC.run_profile = profileSPOC.RunProfile()
+
+        measurements = []
+        measurement, result = measure("process_conditions", lambda: logfileSPOC.process_conditions(filenames["conditions"]), synthetic.num_users)
+        measurements.append(measurement)
+        measurement, result = measure("process_comments", lambda: logfileSPOC.process_comments(filenames["comments"]), num_comments,
+                                      reset=lambda: setattr(logfileSPOC, "list_sentences", []))  # or the second run trains on the comments twice
+        measurements.append(measurement)
+        measurement, result = measure("process_prompts", lambda: logfileSPOC.process_prompts(filenames["prompts"]), max(1, num_comments // 10))
+        measurements.append(measurement)
+
+        # the model and lexicons on their own, outside of the rest of the processing
+        sentences = logfileSPOC.read_sentences(filenames["comments"])
+        # model_dir=None: with utilsSPOC.LDA_MODEL_DIR set, process_comments already saved a model for these sentences, which would be loaded instead of trained
+        measurement, lda = measure("LDAtopicModel training", lambda: ldat(utils.NUM_LDA_TOPICS, sentences, model_dir=None), len(sentences))
+        measurements.append(measurement)
+        measurement, parallel_lda = measure("LDAtopicModel training (2 workers)", lambda: train_seeded(sentences, 2, seed), len(sentences))
+        measurement["repeatable"] = same_topics(parallel_lda, train_seeded(sentences, 2, seed))  # same seed and workers, same topics
+        measurements.append(measurement)
+        documents = [" ".join(sentence) for sentence in sentences]
+        measurement, result = measure("LDAtopicModel inference", lambda: [lda.topic_distribution_scores_list(doc) for doc in documents], len(documents))
+        measurements.append(measurement)
+        sentiment = liwc.liwc()
+        measurement, result = measure("liwc.count_sentiments", lambda: [sentiment.count_sentiments(doc) for doc in documents], len(documents))
+        measurements.append(measurement)
+        measurement, result = measure("liwc.count_sentiments_batch", lambda: sentiment.count_sentiments_batch(documents), len(documents))
+        measurements.append(measurement)
+    finally:
+        os.chdir(cwd)
+    return {"num_comments": num_comments, "measurements": measurements}
+
+def train_seeded(sentences, workers, seed):
+    """
+    Train a seeded LDA model, never loading a saved one
+    :param sentences: list of bags of words
+    :param workers: number of processes to train with
+    :param seed: random_state for training
+    :return: LDAtopicModel
+    """
+    return ldat(utils.NUM_LDA_TOPICS, sentences, workers=workers, random_state=seed, model_dir=None)
+
+def same_topics(lda, other):
+    """
+    :param lda: trained LDAtopicModel
+    :param other: trained LDAtopicModel
+    :return: True if both have exactly the same topics (word probabilities and names)
+    """
+    return bool(np.array_equal(lda.lda.get_topics(), other.lda.get_topics())) and lda.topic_names == other.topic_names
+
+def unrepeatable(results):
+    """
+    Find the seeded trainings that gave different topics when run again
+    :param results: list of benchmark() results
+    :return: list of (num comments, name) tuples
+    """
+    return [(scale["num_comments"], measurement["name"]) for scale in results for measurement in scale["measurements"]
+            if measurement.get("repeatable", True) is False]
+
+def compare(results, baseline, tolerance=0.25):
+    """
+    Find the measurements that got slower than a baseline run
+    :param results: list of benchmark() results
+    :param baseline: list of benchmark() results from an earlier run
+    :param tolerance: fraction slower than the baseline that is still acceptable
+    :return: list of (num comments, name, baseline rows/s, rows/s) tuples for each slowdown
+    """
+    expected = {}
+    for scale in baseline:
+        for measurement in scale["measurements"]:
+            expected[(scale["num_comments"], measurement["name"])] = measurement["rows_per_second"]
+
+    slowdowns = []
+    for scale in results:
+        for measurement in scale["measurements"]:
+            before = expected.get((scale["num_comments"], measurement["name"]), None)
+            after = measurement["rows_per_second"]
+            if before is not None and after is not None and after < before * (1 - tolerance):
+                slowdowns.append((scale["num_comments"], measurement["name"], before, after))
+    return slowdowns
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark logfileSPOC on synthetic logfiles of increasing size")
+    parser.add_argument('--scales', type=int, nargs='+', default=SCALES, help="numbers of comments to benchmark")
+    parser.add_argument('--seed', type=int, default=0, help="random seed for the synthetic logfiles")
+    parser.add_argument('--streaming', action='store_true', help="process the comments with logfileSPOC --streaming")
+    parser.add_argument('--output', default="benchmark.json", help="JSON file to write the measurements to")
+    parser.add_argument('--baseline', default=None, help="JSON file from an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="fraction slower than the baseline before it counts as a slowdown")
+    parser.add_argument('--keep', action='store_true', help="keep the synthetic logfiles and outputs")
+    args = parser.parse_args()
+
+    results = []
+    for num_comments in args.scales:
+        directory = tempfile.mkdtemp(prefix="spoc_benchmark_" + str(num_comments) + "_", dir=utils.SPILL_DIR)
+        try:
+            results.append(benchmark(num_comments, directory, args.seed, args.streaming))
+        finally:
+            if not args.keep:
+                shutil.rmtree(directory)
+
+    with open(args.output, 'w', encoding="utf8") as f:
+        json.dump(results, f, indent=2)
+    print("Wrote " + args.output)
+
+    for num_comments, name in unrepeatable(results):
+        print("NOT REPEATABLE: " + name + " at " + str(num_comments) + " comments trained different topics with the same seed")
+    if len(unrepeatable(results)) > 0:
+        raise SystemExit(1)
+
+    if args.baseline is not None:
+        with open(args.baseline, 'r', encoding="utf8") as f:
+            slowdowns = compare(results, json.load(f), args.tolerance)
+        for num_comments, name, before, after in slowdowns:
+            print("SLOWER: " + name + " at " + str(num_comments) + " comments: " + str(before) + " -> " + str(after) + " rows/s")
+        if len(slowdowns) > 0:
+            raise SystemExit(1)
+        print("No slowdowns compared to " + args.baseline)
@@ -0,0 +1,85 @@
+__author__ = 'IH'
+__project__ = 'spoc-file-processing'
+
+import datetime
+import utilsSPOC as utils
+
+class LectureCalendar(object):
+    """
+    Index of the lecture posting dates in utils.lecture_dates, built once so that looking up a
+    lecture's date, week number or punctuality window doesn't rebuild the list for every comment
+    """
+    lecture_dates = {}  # lecture id -> date posted
+    date_strings = {}  # lecture id -> date posted, as written to the output files
+    week_nums = {}  # lecture id -> index of the lecture in utils.lecture_dates
+    windows = {}  # (lecture id, num weeks) -> (first day, last day) a comment is punctual
+
+    def __init__(self, lecture_dates=utils.lecture_dates):
+        """
+        :param lecture_dates: list of (lecture id, date posted) tuples, in lecture order
+        :return: None
+        """
+        self.lecture_dates = dict(lecture_dates)
+        self.date_strings = {}
+        self.week_nums = {}
+        self.windows = {}
+        lecture_ids = [y[0] for y in lecture_dates]
+        for lecture_id in self.lecture_dates:
+            self.date_strings[lecture_id] = str(self.lecture_dates[lecture_id])
+            self.week_nums[lecture_id] = lecture_ids.index(lecture_id)
+
+    def has_lecture(self, lecture_id):
+        """
+        :param lecture_id: id number of a lecture
+        :return: True if the lecture exists (there's three comments on a lecture that does not exist)
+        """
+        return int(lecture_id) in self.lecture_dates
+
+    def date(self, lecture_id):
+        """
+        :param lecture_id: id number of a lecture
+        :return: the date the lecture was posted
+        """
+        return self.lecture_dates[int(lecture_id)]
+
+    def date_string(self, lecture_id):
+        """
+        :param lecture_id: id number of a lecture
+        :return: the date the lecture was posted, as a string
+        """
+        return self.date_strings[int(lecture_id)]
+
+    def week_num(self, lecture_id):
+        """
+        :param lecture_id: id number of a lecture
+        :return: index of the lecture in the list of lecture dates
+        """
+        return self.week_nums[int(lecture_id)]
+
+    def window(self, lecture_id, num_weeks=utils.WEEK_THRESHOLD):
+        """
+        The range of dates a comment on the lecture must be posted within to be punctual
+        :param lecture_id: id number of a lecture
+        :param num_weeks: number of weeks after the lecture is posted
+        :return: (first day, last day) tuple, or None if the lecture does not exist
+        """
+        key = (int(lecture_id), num_weeks)
+        if key not in self.windows:
+            if key[0] not in self.lecture_dates:
+                return None
+            first_day = self.lecture_dates[key[0]]
+            self.windows[key] = (first_day, first_day + datetime.timedelta(weeks=num_weeks))
+        return self.windows[key]
+
+    def days_after(self, comment_date, lecture_id):
+        """
+        Number of days apart a comment is from the lecture it was posted to
+        :param comment_date: datetime the comment was posted
+        :param lecture_id: id number of the lecture the comment belongs to
+        :return: number of days, or "" if the lecture does not exist
+        """
+        lecture_date = self.lecture_dates.get(int(lecture_id), None)
+        if lecture_date is None:
+            return ""
+        return (comment_date.date() - lecture_date).days
+
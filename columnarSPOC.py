@@ -0,0 +1,189 @@
+__author__ = 'IH'
+__project__ = 'spoc-file-processing'
+
+"""
+This columnarSPOC file writes the output files either as CSV or in a columnar format
+(Parquet or Feather) with proper column types, and reads them back for the analysis scripts
+"""
+
+import csv
+import os
+import re
+import utilsSPOC as utils
+import compressionSPOC
+
+EXTENSIONS = {"csv": utils.FILE_EXTENSION, "parquet": ".parquet", "feather": ".feather"}
+DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}( \d{2}:\d{2}:\d{2})?$')
+
+def output_filename(name, fmt=utils.OUTPUT_FORMAT, compression=utils.OUTPUT_COMPRESSION):
+    """
+    :param name: filename without extension
+    :param fmt: output format ("csv", "parquet" or "feather")
+    :param compression: compression extension for CSV files, e.g. ".gz" ("" = not compressed)
+    :return: the filename with the extension for the given format
+    """
+    if fmt not in EXTENSIONS:
+        raise ValueError("Unknown output format '" + str(fmt) + "'. Expected one of " + str(sorted(EXTENSIONS)))
+    if compression and compression not in compressionSPOC.COMPRESSIONS:
+        raise ValueError("Unknown compression '" + str(compression) + "'. Expected one of " + str(sorted(compressionSPOC.COMPRESSIONS)))
+    if fmt == "csv" and compression:
+        return name + EXTENSIONS[fmt] + compression
+    return name + EXTENSIONS[fmt]
+
+def file_format(filename):
+    """
+    :param filename: name of an output file
+    :return: the format of the file, based on its extension
+    """
+    for fmt in ("parquet", "feather"):
+        if filename.endswith(EXTENSIONS[fmt]):
+            return fmt
+    return "csv"
+
+def open_writer(filename, headers, fmt="csv", append=False, encoding="utf8"):
+    """
+    Open a file for writing rows to, in the given format
+    :param filename: output filename
+    :param headers: list of column headers
+    :param fmt: output format ("csv", "parquet" or "feather")
+    :param append: add rows to the end of an existing file instead of overwriting it
+    :param encoding: text encoding (CSV only)
+    :return: a writer with writerow(), writerows() and close()
+    """
+    if fmt == "csv":
+        return CsvWriter(filename, headers, append, encoding)
+    if fmt not in EXTENSIONS:
+        raise ValueError("Unknown output format '" + str(fmt) + "'. Expected one of " + str(sorted(EXTENSIONS)))
+    return ColumnarWriter(filename, headers, fmt, append)
+
+def read_table(filename, columns=None):
+    """
+    Read an output file into a data frame, only loading the given columns
+    :param filename: a CSV (compressed or not), Parquet or Feather file written by logfileSPOC
+    :param columns: list of columns to load (None for all)
+    :return: pandas data frame
+    """
+    import pandas as pd
+    filename = compressionSPOC.find_file(filename)
+    fmt = file_format(filename)
+    if fmt == "parquet":
+        return pd.read_parquet(filename, columns=columns)
+    elif fmt == "feather":
+        return pd.read_feather(filename, columns=columns)
+    with compressionSPOC.open_text(filename, encoding="utf-8-sig") as csvfile:
+        return pd.read_csv(csvfile, usecols=columns)
+
+class TableWriter(object):
+    """
+    Base class for the output writers, so they can be used in a with statement
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def writerow(self, row):
+        raise NotImplementedError
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def close(self):
+        raise NotImplementedError
+
+class CsvWriter(TableWriter):
+    """
+    Writes rows to a CSV file, the way the output files have always been written
+    """
+    def __init__(self, filename, headers, append=False, encoding="utf8"):
+        self.filename = filename
+        self.file = compressionSPOC.open_text(filename, 'a' if append else 'w', encoding=encoding)
+        self.writer = csv.writer(self.file, delimiter=utils.DELIMITER, quotechar='\"', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
+        if not append:
+            self.writer.writerow(headers)
+
+    def writerow(self, row):
+        self.writer.writerow(row)
+
+    def writerows(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+class ColumnarWriter(TableWriter):
+    """
+    Collects rows column by column and writes them to a Parquet or Feather file on close(),
+    converting each column to a numeric, boolean or datetime type where all its values allow it
+    """
+    def __init__(self, filename, headers, fmt, append=False):
+        self.filename = filename
+        self.fmt = fmt
+        self.append = append
+        self.headers = unique_headers(headers)
+        self.columns = [[] for header in self.headers]
+
+    def writerow(self, row):
+        while len(row) > len(self.columns):  # extra values get an unnamed column, like pandas gives them
+            self.headers.append("Unnamed: " + str(len(self.columns)))
+            self.columns.append([""] * len(self.columns[0]) if len(self.columns) > 0 else [])
+        for i in range(len(row)):
+            self.columns[i].append(row[i])
+        for i in range(len(row), len(self.columns)):  # short rows are padded with blanks, like a CSV reader would
+            self.columns[i].append("")
+
+    def close(self):
+        import pandas as pd
+        data = pd.DataFrame({header: to_typed_column(column) for header, column in zip(self.headers, self.columns)}, columns=self.headers)
+        if self.append and os.path.exists(self.filename):
+            data = pd.concat([read_table(self.filename), data], ignore_index=True)
+        if self.fmt == "parquet":
+            data.to_parquet(self.filename, index=False)
+        else:
+            data.to_feather(self.filename)
+        self.columns = [[] for header in self.headers]
+
+def unique_headers(headers):
+    """
+    Rename repeated headers "name.1", "name.2", etc., the same way pandas names them when reading a CSV
+    :param headers: list of column headers
+    :return: list of unique column headers
+    """
+    seen = {}
+    unique = []
+    for header in headers:
+        if header in seen:
+            seen[header] += 1
+            header = header + "." + str(seen[header])
+        else:
+            seen[header] = 0
+        unique.append(header)
+    return unique
+
+def to_typed_column(values):
+    """
+    Convert a column of output values (mostly strings) to the most specific type they all fit
+    :param values: list of values, where "" means missing
+    :return: pandas series
+    """
+    import pandas as pd
+    cleaned = pd.Series([None if x is None or x == "" else x for x in values], dtype=object)
+    present = cleaned.dropna()
+    if len(present) == 0:
+        return cleaned.astype("string")
+
+    text = present.astype(str)
+    if text.isin(["True", "False"]).all():
+        return cleaned.map(lambda x: None if x is None else str(x) == "True").astype("boolean")
+
+    numbers = pd.to_numeric(cleaned, errors='coerce')
+    if numbers.notna().sum() == len(present):
+        if (numbers.dropna() % 1 == 0).all():
+            return numbers.astype("Int64")
+        return numbers.astype("float64")
+
+    if text.map(lambda x: DATE_PATTERN.match(x) is not None).all():
+        return pd.to_datetime(cleaned, format='ISO8601', errors='coerce')
+    return cleaned.astype("string")
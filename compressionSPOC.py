@@ -0,0 +1,79 @@
+__author__ = 'IH'
+__project__ = 'spoc-file-processing'
+
+"""
+This compressionSPOC file opens the logfiles and output files whether or not they're compressed
+(gzip, bzip2, xz or zstd, by their extension), streaming them through a large buffer so a
+compressed export never needs to be decompressed to disk first
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import os
+import utilsSPOC as utils
+try:
+    import zstandard  # optional, only needed for .zst files
+except ImportError:
+    zstandard = None
+
+COMPRESSIONS = {".gz": "gzip", ".bz2": "bzip2", ".xz": "xz", ".zst": "zstd"}  # extension -> compression
+
+def compression(filename):
+    """
+    :param filename: name of a file
+    :return: the file's compression, based on its extension, or None if it's not compressed
+    """
+    for extension, name in COMPRESSIONS.items():
+        if filename.endswith(extension):
+            return name
+    return None
+
+def find_file(filename):
+    """
+    Find a file, or a compressed copy of it (e.g., the comments logfile stored as .csv.gz)
+    :param filename: name of an uncompressed file
+    :return: the filename if it exists, otherwise the first compressed copy that exists (or the filename if none do)
+    """
+    if os.path.exists(filename) or compression(filename) is not None:
+        return filename
+    for extension in COMPRESSIONS:
+        if os.path.exists(filename + extension):
+            return filename + extension
+    return filename
+
+def open_text(filename, mode='r', encoding=None, newline=None, buffer_size=utils.IO_BUFFER_SIZE):
+    """
+    Open a text file for reading, writing or appending, compressed or not
+    :param filename: name of the file, with a compression extension if it's compressed
+    :param mode: 'r', 'w' or 'a'
+    :param encoding: text encoding (None = the default, like open())
+    :param newline: newline handling, like open()
+    :param buffer_size: number of bytes to read or write at a time
+    :return: text file object
+    """
+    kind = compression(filename)
+    if kind is None:
+        return open(filename, mode, buffering=buffer_size, encoding=encoding, newline=newline)
+
+    if kind == "gzip":
+        raw = gzip.open(filename, mode + 'b', compresslevel=6)
+    elif kind == "bzip2":
+        raw = bz2.open(filename, mode + 'b')
+    elif kind == "xz":
+        raw = lzma.open(filename, mode + 'b')
+    else:
+        if zstandard is None:
+            raise ImportError("reading or writing " + filename + " needs the zstandard package (pip install zstandard)")
+        handle = open(filename, mode + 'b')
+        if mode == 'r':
+            raw = zstandard.ZstdDecompressor().stream_reader(handle, read_size=buffer_size, closefd=True)
+        else:  # appending adds another zstd frame, which readers decompress as if it were one
+            raw = zstandard.ZstdCompressor().stream_writer(handle, write_size=buffer_size, closefd=True)
+
+    if mode == 'r':
+        buffered = io.BufferedReader(raw, buffer_size)
+    else:
+        buffered = io.BufferedWriter(raw, buffer_size)
+    return io.TextIOWrapper(buffered, encoding=encoding, newline=newline)
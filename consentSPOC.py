@@ -0,0 +1,63 @@
+__author__ = 'IH'
+__project__ = 'spoc-file-processing'
+
+"""
+This consentSPOC file holds which students consented to the study and which dropped it, so checking
+a user id is a set lookup instead of a scan through the lists in utilsSPOC
+"""
+
+import re
+import utilsSPOC as utils
+
+ID_SEPARATORS = re.compile(r'[\s,]+')
+
+def read_ids(filename):
+    """
+    Read a roster file: user ids separated by commas, spaces or new lines. Anything after a # is a comment.
+    :param filename: roster file
+    :return: list of user ids (ints)
+    """
+    ids = []
+    with open(filename, 'r', encoding="utf-8-sig") as roster:
+        for line in roster:
+            line = line.split('#')[0]
+            ids += [int(uid) for uid in ID_SEPARATORS.split(line) if len(uid) > 0]
+    return ids
+
+class ConsentRegistry(object):
+    """
+    The consenting students minus the dropped students, as a frozen set
+    """
+    consenting = frozenset()
+    dropped = frozenset()
+
+    def __init__(self, consenting=None, dropped=None, roster_file=utils.ROSTER_FILE, drop_file=utils.DROP_FILE):
+        """
+        :param consenting: list of consenting user ids (default the roster file, or utils.CONSENTING_STUDENTS)
+        :param dropped: list of dropped user ids (default the drop file, or utils.DROP_STUDENTS)
+        :param roster_file: file of consenting user ids, used if consenting is None
+        :param drop_file: file of dropped user ids, used if dropped is None
+        :return: None
+        """
+        if consenting is None:
+            consenting = read_ids(roster_file) if roster_file is not None else utils.CONSENTING_STUDENTS
+        if dropped is None:
+            dropped = read_ids(drop_file) if drop_file is not None else utils.DROP_STUDENTS
+        self.consenting = frozenset(int(uid) for uid in consenting)
+        self.dropped = frozenset(int(uid) for uid in dropped)
+        self.allowed = self.consenting - self.dropped
+        self.checked = {}  # user id as read from a file -> True if consenting, so each id is only parsed once
+
+    def is_consenting(self, user_id):
+        """
+        Check to see if given user ID is a consenting one
+        :param user_id: a user id (int or string, as read from a file)
+        :return: True if user is consenting and has not dropped
+        """
+        try:
+            return self.checked[user_id]
+        except KeyError:
+            consenting = int(user_id) in self.allowed
+            self.checked[user_id] = consenting
+            return consenting
+
@@ -0,0 +1,100 @@
+__author__ = 'IH'
+__project__ = 'spoc-file-processing'
+
+"""
+This diagnosticsSPOC file collects the warnings raised while processing a logfile (e.g., comments
+from non-consenting students), counting them by category and user and keeping a few examples,
+so each stage prints one summary instead of a line per row
+"""
+
+import collections
+import json
+import utilsSPOC as utils
+
+# category -> message for one example, formatted with the details given to Diagnostics.warn()
+MESSAGES = {
+    "non_consenting_author": "user_id {user_id} may not be consenting. Not writing.",
+    "before_experiment": "comment timestamp {timestamp} is not within date range of experiment. Not writing.",
+    "late_comment": "comment timestamp {timestamp} is not near posting date of lecture #{lecture_id}. Not writing.",
+    "before_lecture": "Comment was posted BEFORE lecture was posted: {first_day} > {timestamp}",
+    "non_consenting_recipient": "recipient of prompt ({user_id}) not consenting.",
+}
+
+class Diagnostics(object):
+    """
+    The warnings from one stage of processing (e.g., one logfile)
+    """
+    stage = ""
+    sample_size = 0
+    counts = {}  # category -> number of warnings
+    users = {}  # category -> Counter of user id -> number of warnings
+    samples = {}  # category -> list of up to sample_size example messages
+
+    def __init__(self, stage, sample_size=utils.DIAGNOSTIC_SAMPLES):
+        """
+        :param stage: name of the stage, e.g., the logfile being processed
+        :param sample_size: number of example messages to keep for each category
+        :return: None
+        """
+        self.stage = stage
+        self.sample_size = sample_size
+        self.counts = collections.Counter()
+        self.users = collections.defaultdict(collections.Counter)
+        self.samples = collections.defaultdict(list)
+
+    def warn(self, category, user_id=None, **details):
+        """
+        Count one warning. The message is only formatted if it's kept as an example.
+        :param category: kind of warning, a key of MESSAGES
+        :param user_id: user the warning is about, if any
+        :param details: values for the category's message
+        :return: None
+        """
+        self.counts[category] += 1
+        if user_id is not None:
+            self.users[category][user_id] += 1
+        if len(self.samples[category]) < self.sample_size:
+            self.samples[category].append(MESSAGES[category].format(user_id=user_id, **details))
+
+    def count(self, category):
+        """
+        :param category: kind of warning
+        :return: number of warnings of that kind
+        """
+        return self.counts[category]
+
+    def summary(self):
+        """
+        :return: the summary of this stage's warnings, one line per category and example
+        """
+        if len(self.counts) < 1:
+            return "\tNo warnings from " + self.stage
+        lines = ["\tWarnings from " + self.stage + ":"]
+        for category in sorted(self.counts):
+            line = "\t  " + category + ": " + str(self.counts[category])
+            if len(self.users[category]) > 0:
+                line += " (" + str(len(self.users[category])) + " users)"
+            lines.append(line + ", e.g.:")
+            for sample in self.samples[category]:
+                lines.append("\t    " + sample)
+        return "\n".join(lines)
+
+    def to_dict(self):
+        """
+        :return: this stage's warnings as a dict, for a JSON report
+        """
+        return {"stage": self.stage,
+                "counts": dict(self.counts),
+                "users": {category: {str(uid): n for uid, n in users.items()} for category, users in self.users.items()},
+                "samples": dict(self.samples)}
+
+def write_report(reports, filename):
+    """
+    Write the warnings from every stage to a JSON file
+    :param reports: list of Diagnostics.to_dict() of each stage
+    :param filename: JSON file to write
+    :return: None
+    """
+    with open(filename, 'w', encoding="utf8") as f:
+        json.dump(reports, f, indent=2)
+    print("Wrote warnings report " + filename)
@@ -0,0 +1,74 @@
+__author__ = 'IH'
+__project__ = 'spoc-file-processing'
+
+"""
+This featuresSPOC file splits each comment into words once, and computes everything logfileSPOC
+needs to know about the comment's text from those words: its LDA topic scores, LIWC sentiment
+counts, word lengths, and whether it asks for help
+"""
+
+import re
+
+HELP_PATTERN = re.compile(r"help|question|\?|dunno|n't know|confus|struggl|lost|stuck|know how")  # anywhere in a comment, not only whole words
+
+class CommentFeatures(object):
+    """
+    One comment's text and its words, split once and shared by every feature
+    """
+    comment = ""
+    words = []  # the comment split on whitespace, as the LDA model and word lengths see it
+    liwc_words = []  # the lowercased comment split on single spaces, as liwc counts it
+
+    def __init__(self, comment):
+        """
+        :param comment: the comment string
+        :return: None
+        """
+        self.comment = comment
+        self.words = comment.split()
+        self.liwc_words = comment.lower().split(' ')
+
+    def topic_scores(self, lda):
+        """
+        :param lda: a trained LDAtopicModel
+        :return: (topic name, list of topic distribution scores) tuple, from one inference
+        """
+        return lda.topic_scores(self.words)
+
+    def is_help_request(self):
+        """
+        :return: True if the comment asks a question or for help
+        """
+        return is_help_topic(self.comment)
+
+    def word_lengths(self):
+        """
+        :return: (mean word length, median word length) tuple
+        """
+        lengths = [len(word) for word in self.words]
+        return sum(lengths)/len(lengths), median(lengths)
+
+def comment_features(comments):
+    """
+    :param comments: list of comment strings
+    :return: list of CommentFeatures, one per comment
+    """
+    return [CommentFeatures(comment) for comment in comments]
+
+def median(x):
+  """
+  Takes in a list of numbers and output the middle number
+  """
+  if len(x) < 1:
+      return 0
+  x.sort()  # after taking the list, sort it
+  return (x[int(len(x)/2)])
+
+def is_help_topic(sentence):
+    """
+    Determine if the given string (message post) contains a question or help request.
+    :param sentence: a string sentence / message post
+    :return: True if the string is about help seeking
+    """
+    # TODO: this is a super naive way to determine this
+    return HELP_PATTERN.search(sentence) is not None
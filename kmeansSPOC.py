@@ -11,10 +11,11 @@ from scipy.cluster.vq import kmeans, vq
 from scipy.spatial.distance import cdist
 import matplotlib.pyplot as plt
 import utilsSPOC as utils
+import columnarSPOC as columnar
 import pandas as pd
 
 
-def load_data(filename=utils.MOD_FILE+utils.FILE_EXTENSION):
+def load_data(filename=columnar.output_filename(utils.MOD_FILE)):
     """
     Load the data, converting categorical variables and everything else to float values.
     :param filename: filename where data is stored
@@ -22,7 +23,7 @@ def load_data(filename=utils.MOD_FILE+utils.FILE_EXTENSION):
     """
     # Exception handling in case the logfile doesn't exist
     try:
-        data = pd.io.parsers.read_csv(filename, encoding="utf-8-sig")
+        data = columnar.read_table(filename, columns=[utils.COL_VOTING, utils.COL_PROMPTS, utils.COL_NUM_PROMPTS, utils.COL_MIDGRADE, utils.COL_NUM_COMMENTS])
     except OSError as e:
         print("ERROR: " + filename + " does not exist. Did you run logfileSPOC.py?")
 
@@ -2,29 +2,99 @@ __author__ = 'IH'
 __project__ = 'spoc-file-processing'
 
 import urllib.request as ur
+import os
+import pickle
 import re
+import numpy as np
+from scipy import sparse
 from html.parser import HTMLParser
+import utilsSPOC as utils
+
+WILDCARD = '*'  # LIWC-style entry ending, e.g. confus* matches confused, confusing, ...
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+loaded_lexicons = {}  # (lexicon file, modified time, size) tuples -> Lexicons already loaded by this process
+
+class Lexicon(object):
+    """
+    A set of sentiment words, plus a prefix trie for the wildcard entries.
+    Looking up a word takes time proportional to its length, not to the size of the lexicon.
+    """
+    words = set()  # entries without a wildcard
+    prefixes = {}  # trie of wildcard entries: char -> child node, with WILDCARD -> True where an entry ends
+    num_prefixes = 0
+
+    def __init__(self, entries=()):
+        """
+        :param entries: iterable of words, e.g. the lines of a lexicon file. Empty lines are dropped.
+        :return: None
+        """
+        self.words = set()
+        self.prefixes = {}
+        self.num_prefixes = 0
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry):
+        """
+        Add a word, or a prefix if it ends with a wildcard
+        :param entry: the word
+        :return: None
+        """
+        entry = entry.strip()
+        if len(entry) < 1:
+            return
+        if not entry.endswith(WILDCARD):
+            self.words.add(entry)
+            return
+        node = self.prefixes
+        for char in entry.rstrip(WILDCARD):
+            node = node.setdefault(char, {})
+        if WILDCARD not in node:
+            node[WILDCARD] = True
+            self.num_prefixes += 1
+
+    def __contains__(self, word):
+        if word in self.words:
+            return True
+        if self.num_prefixes < 1:
+            return False
+        node = self.prefixes
+        if WILDCARD in node:  # a lone wildcard matches everything
+            return True
+        for char in word:
+            node = node.get(char, None)
+            if node is None:
+                return False
+            if WILDCARD in node:
+                return True
+        return False
+
+    def __len__(self):
+        return len(self.words) + self.num_prefixes
 
 class liwc(object):
     """
     Class contains an LDA topic model for one set of documents.
     Mostly exists as a way to access (and setup) topic_names
     """
-    negative_words = []
-    positive_words = []
+    negative_words = Lexicon()
+    positive_words = Lexicon()
+    vocabulary = {}  # word -> column, for every word seen by count_sentiments_batch
+    positive_indicator = None  # column -> 1 if the word is positive
+    negative_indicator = None  # column -> 1 if the word is negative (and not positive)
     FORMAT_LINE = "--------------------"
 
-    def __init__(self, path='http://www.unc.edu/~ncaren/haphazard/',  files=['negative.txt', 'positive.txt']):
+    def __init__(self, path=utils.LEXICON_DIR,  files=['negative.txt', 'positive.txt']):
         """
         Initialize class with documents of positive/negative sentiment words
-        :param path: the URL location of the files
-        :param files: filenames of sentiment files
+        :param path: directory of the files (None = the working directory if they're there, otherwise this package's directory)
+        :param files: filenames of the negative and positive sentiment files
         :return: None
         """
-        pos_sent = open("positive.txt").read()
-        self.positive_words = pos_sent.split('\n')
-        neg_sent = open("negative.txt").read()
-        self.negative_words = neg_sent.split('\n')
+        self.negative_words, self.positive_words = load_lexicons(find_lexicons(path, files))
+        self.vocabulary = {}
+        self.positive_indicator = np.zeros(0, dtype=np.int64)
+        self.negative_indicator = np.zeros(0, dtype=np.int64)
 
     def count_sentiments(self, line):
         """
@@ -42,6 +112,57 @@ class liwc(object):
                 num_negative += 1
         return num_positive, num_negative, len(words)
 
+    def count_sentiments_batch(self, lines):
+        """
+        Counts the number of positive, negative and total words in each of many strings at once,
+        the same way as count_sentiments. Each distinct word is only looked up in the lexicons once,
+        then a sparse document-word matrix is multiplied by the lexicons' indicator vectors.
+        :param lines: list (or array) of strings
+        :return: the number of positive, negative, and total words in each string, as a tuple of NumPy arrays
+        """
+        return self.count_words_batch([line.lower().split(' ') for line in lines])
+
+    def count_words_batch(self, word_lists):
+        """
+        Counts the number of positive, negative and total words in each of many lists of words at once
+        :param word_lists: list of lists of lowercased words, each a string split on ' ' (see count_sentiments)
+        :return: the number of positive, negative, and total words in each list, as a tuple of NumPy arrays
+        """
+        vocabulary = self.vocabulary
+        columns = []  # column of each word, list after list
+        offsets = [0]  # where each list's words start in columns
+        new_words = []  # words added to the vocabulary by this batch, in column order
+        for words in word_lists:
+            for word in words:
+                column = vocabulary.get(word, None)
+                if column is None:
+                    column = len(vocabulary)
+                    vocabulary[word] = column
+                    new_words.append(word)
+                columns.append(column)
+            offsets.append(len(columns))
+        self.update_indicators(new_words)
+
+        counts = sparse.csr_matrix((np.ones(len(columns), dtype=np.int64), np.array(columns, dtype=np.int64), np.array(offsets, dtype=np.int64)),
+                                   shape=(len(offsets) - 1, len(vocabulary)))
+        num_positive = counts @ self.positive_indicator
+        num_negative = counts @ self.negative_indicator
+        num_words = np.diff(np.array(offsets, dtype=np.int64))
+        return num_positive, num_negative, num_words
+
+    def update_indicators(self, new_words):
+        """
+        Extend the positive/negative indicator vectors to the words just added to the vocabulary
+        :param new_words: list of the new words, in the order of their columns
+        :return: None
+        """
+        if len(new_words) < 1:
+            return
+        positive = np.array([word in self.positive_words for word in new_words], dtype=np.int64)
+        negative = np.array([word not in self.positive_words and word in self.negative_words for word in new_words], dtype=np.int64)
+        self.positive_indicator = np.concatenate([self.positive_indicator, positive])
+        self.negative_indicator = np.concatenate([self.negative_indicator, negative])
+
     @staticmethod
     def clean_string(sentence):
         """
@@ -62,6 +183,55 @@ class liwc(object):
         # TODO: Should removed characters be replaced with a space? Or no space (as is)?
         return cleaned.lower()
 
+def find_lexicons(path, files):
+    """
+    :param path: directory of the lexicon files, or None to look in the working directory and then this package's directory
+    :param files: filenames of the lexicon files
+    :return: list of the lexicon files' paths
+    """
+    if path is None:
+        path = "." if all(os.path.exists(filename) for filename in files) else PACKAGE_DIR
+    return [os.path.join(path, filename) for filename in files]
+
+def load_lexicons(filenames, cache_file=utils.LEXICON_CACHE):
+    """
+    Load lexicon files, each into a Lexicon. Each process only reads them once, and the Lexicons are
+    also saved to a cache file next to the first lexicon, which later processes load instead of
+    parsing the files again (as long as the files haven't changed).
+    :param filenames: list of lexicon files
+    :param cache_file: name of the cache file (None = don't cache to disk)
+    :return: list of Lexicons, one per file (shared by every liwc object that loads the same files)
+    """
+    sources = tuple((os.path.abspath(filename), os.stat(filename).st_mtime_ns, os.stat(filename).st_size) for filename in filenames)
+    if sources in loaded_lexicons:
+        return loaded_lexicons[sources]
+
+    cache_path = None
+    lexicons = None
+    if cache_file is not None:
+        cache_path = os.path.join(os.path.dirname(sources[0][0]), cache_file)
+        try:
+            with open(cache_path, 'rb') as f:
+                cached = pickle.load(f)
+            if cached["sources"] == sources:
+                lexicons = cached["lexicons"]
+        except (OSError, EOFError, KeyError, pickle.UnpicklingError):
+            pass  # no usable cache: parse the files
+
+    if lexicons is None:
+        lexicons = []
+        for filename in filenames:
+            with open(filename, 'r') as f:
+                lexicons.append(Lexicon(f.read().split('\n')))
+        if cache_path is not None:
+            try:
+                with open(cache_path, 'wb') as f:
+                    pickle.dump({"sources": sources, "lexicons": lexicons}, f, pickle.HIGHEST_PROTOCOL)
+            except OSError:
+                pass  # e.g., a read-only directory: just don't cache
+    loaded_lexicons[sources] = lexicons
+    return lexicons
+
 class MLStripper(HTMLParser):
     """
     A class for stripping HTML tags from a string
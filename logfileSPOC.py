@@ -1,38 +1,379 @@
 __author__ = 'IH'
 __project__ = 'spoc-file-processing'
 
+import argparse
+import contextlib
+import copy
+import cProfile
 import csv
 import datetime
+import multiprocessing
+import os
+import pickle
+import tempfile
 import utilsSPOC as utils
 import UserSPOC as user
 from topicModelLDA import LDAtopicModel as ldat
 import liwc as liwc
+import spillSPOC
+import schemaSPOC as schema
+import calendarSPOC
+import timestampSPOC
+import columnarSPOC as columnar
+import aggregateSPOC as aggregate
+import consentSPOC
+import diagnosticsSPOC
+import profileSPOC
+import windowSPOC
+import timelineSPOC
+import compressionSPOC
+import readerSPOC
+import featuresSPOC as features
 
 # variables
 is_only_second_half = True
+is_streaming = False  # parse the comments file once, spilling it to disk, instead of reading it twice
+num_workers = 1  # number of processes to score comments with (1 = score in this process)
+is_incremental = False  # only process comments/prompts added since the last checkpoint
+output_format = utils.OUTPUT_FORMAT  # "csv", "parquet" or "feather"
+output_compression = utils.OUTPUT_COMPRESSION  # "", ".gz", ".bz2", ".xz" or ".zst", for CSV outputs
+csv_reader = utils.CSV_READER  # parser for the logfiles: "csv", "pandas" or "pyarrow"
+aggregation = "rows"  # count each user's comments one at a time ("rows") or all at once from a table ("table")
+analysis_windows = None if utils.ANALYSIS_WINDOWS is None else [windowSPOC.parse_window(w) for w in utils.ANALYSIS_WINDOWS]  # list of AnalysisWindow (None = only the one is_only_second_half picks)
 all_users = {}  # uid -> UserSPOC: all users in the file and their conditions
+window_users = {}  # window suffix -> uid -> UserSPOC: each window's own copy of the users and its counts
+timeline_windows = [timelineSPOC.parse_window(w) for w in utils.TIMELINE_WINDOWS]  # extra _mod columns counted from the timelines
+window_timelines = {}  # window suffix -> Timelines of the window's comments (only kept if there are timeline_windows)
 list_sentences = []  # a list of bag of words from all comments
 
 first_prompt_dates = {}  # uid --> timestamp: first time of prompt being received by student
+lecture_calendar = calendarSPOC.LectureCalendar()  # lecture id -> date posted, week number
+quarantine = timestampSPOC.Quarantine()  # rows with malformed timestamps
+consent = consentSPOC.ConsentRegistry()  # consenting students, minus the dropped ones
+diagnostics = diagnosticsSPOC.Diagnostics("logfileSPOC")  # warnings from the current stage
+diagnostics_reports = []  # warnings from each finished stage
+diagnostics_file = utils.DIAGNOSTICS_FILE  # JSON file to write the warnings to (None = only print a summary)
+run_profile = profileSPOC.RunProfile(utils.TRACE_MEMORY)  # time spent in each stage and step
+timings_file = utils.TIMINGS_FILE  # JSON file to write the timings to (None = only print a summary)
+profile_file = utils.PROFILE_FILE  # file to write cProfile stats to (None = don't profile)
 
-def run():
-    process_conditions()
-    process_comments()
-    process_prompts()
+lda_model = None  # the LDA topic model comments were scored with
+last_comment_id = 0  # highest comment/prompt ids processed so far, for incremental runs
+last_prompt_id = 0
 
-    # writing the users file to CSV
-    filename = utils.MOD_FILE + utils.FILE_EXTENSION
+scoring_lda = None  # LDA model and LIWC lexicons used by this process to score comments
+scoring_sentiment = None
+
+def run(incremental=None, comment_files=None, prompt_files=None, windows=None):
+    """
+    Process the conditions, comments and prompts logfiles and write the users file
+    :param incremental: only process comments/prompts added since the last checkpoint (default is_incremental)
+    :param comment_files: list of comments logfiles to process as shards, instead of the one in utils
+    :param prompt_files: list of prompts logfiles to process as shards, instead of the one in utils
+    :param windows: list of AnalysisWindow to write outputs for, all from one parse and one LDA model (default analysis_windows)
+    :return: None
+    """
+    global analysis_windows
+    if incremental is None:
+        incremental = is_incremental
+    if windows is not None:
+        analysis_windows = windows
+    windowSPOC.check_windows(active_windows())
+    run_profile.start()
+    profiler = None
+    if profile_file is not None:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    if comment_files is not None or prompt_files is not None:
+        if comment_files is None:
+            comment_files = [utils.FILE_POSTS+utils.FILE_EXTENSION]
+        if prompt_files is None:
+            prompt_files = [utils.FILE_PROMPTS+utils.FILE_EXTENSION]
+        if incremental:
+            print("Warning: sharded runs are not incremental. Processing all files.")
+            incremental = False
+        process_conditions()
+        process_shards(comment_files, prompt_files)
+    elif incremental and load_checkpoint():
+        # merge only the new comments/prompts into the existing outputs, using the checkpointed model
+        quarantine.append = True  # keep the rows quarantined by earlier runs
+        process_comments(lda=lda_model, after_id=last_comment_id)
+        process_prompts(after_id=last_prompt_id)
+    else:
+        process_conditions()
+        process_comments()
+        process_prompts()
+
+    # writing the users file, one for each window
+    for window in active_windows():
+        write_users(window_users[window.suffix], columnar.output_filename(utils.MOD_FILE + window.suffix, output_format, output_compression), window_timelines[window.suffix])
+    quarantine.close()
+    if diagnostics_file is not None:
+        diagnosticsSPOC.write_report(diagnostics_reports, diagnostics_file)
+
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(profile_file)
+        print("Wrote profile " + profile_file)
+    print("Timings:\n" + run_profile.summary())
+    if timings_file is not None:
+        run_profile.write_report(timings_file)
+    run_profile.stop()
+
+    if incremental:
+        save_checkpoint()
+
+def write_users(users, filename, timelines=None):
+    """
+    Write the users file: each user's conditions and counts, then a column for each of the timeline_windows
+    :param users: dict uid -> UserSPOC
+    :param filename: output file
+    :param timelines: Timelines of the users' comments, to count the timeline_windows from
+    :return: None
+    """
+    run_profile.begin(filename)
+    headers = user.UserSPOC.get_headers(utils.DELIMITER).split(utils.DELIMITER)
+    headers += [window.column for window in timeline_windows]
+    lecture_days = timelineSPOC.anchor_days(lecture_calendar.lecture_dates.values())
+
+    # written with csv.writer (for CSV), so fields with commas stay whole
+    with columnar.open_writer(filename, headers, output_format, encoding=None) as modfile_out:
+        for usr in users:
+            modfile_out.writerow(users[usr].to_list() + timeline_counts(usr, users[usr], timelines, lecture_days))
+    run_profile.end(rows=len(users))
+
+def timeline_counts(uid, usr, timelines, lecture_days):
+    """
+    :param uid: the user's id
+    :param usr: UserSPOC
+    :param timelines: Timelines of the comments
+    :param lecture_days: day numbers the lectures were posted
+    :return: list of the user's count for each of the timeline_windows
+    """
+    first_prompt = getattr(usr, utils.COL_FIRST_PROMPT_DATE, "")
+    return [timelines.count(uid, window, first_prompt, lecture_days) for window in timeline_windows]
+
+def active_windows():
+    """
+    :return: list of AnalysisWindow this run writes outputs for
+    """
+    if analysis_windows is not None:
+        return analysis_windows
     if is_only_second_half:
-        filename = utils.MOD_FILE + utils.MT_FILE + utils.FILE_EXTENSION
+        return [windowSPOC.SECOND_HALF]
+    return [windowSPOC.FULL_TERM]
+
+def start_windows():
+    """
+    Give each window its own copy of the users, with all counts at zero. The first window keeps all_users itself.
+    :return: None
+    """
+    global window_users, window_timelines
+    window_users = {}
+    window_timelines = {}
+    for i, window in enumerate(active_windows()):
+        window_timelines[window.suffix] = timelineSPOC.Timelines()
+        if i == 0:
+            window_users[window.suffix] = all_users
+        else:
+            window_users[window.suffix] = {uid: copy.copy(usr) for uid, usr in all_users.items()}
+
+def save_checkpoint(filename=utils.CHECKPOINT_FILE):
+    """
+    Save everything needed to later process only new comments and prompts: the users (with their
+    counts so far), the last comment and prompt ids processed, and the trained LDA model
+    :param filename: checkpoint file to write
+    :return: None
+    """
+    state = {"windows": [window.definition() for window in active_windows()], "window_users": window_users, "window_timelines": window_timelines, "lda_model": lda_model,
+             "last_comment_id": last_comment_id, "last_prompt_id": last_prompt_id}
+    with open(filename, 'wb') as f:
+        pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+    print("Saved checkpoint " + filename + " (last comment id " + str(last_comment_id) + ", last prompt id " + str(last_prompt_id) + ")")
 
-    modfile_out = open(filename, 'w')
-    modfile_out.write(user.UserSPOC.get_headers(utils.DELIMITER) + '\n')
+def load_checkpoint(filename=utils.CHECKPOINT_FILE):
+    """
+    Restore the users, last processed ids and LDA model from a checkpoint
+    :param filename: checkpoint file to read
+    :return: True if the checkpoint was loaded, False if there is no usable checkpoint
+    """
+    global all_users, window_users, window_timelines, lda_model, last_comment_id, last_prompt_id
+    if not os.path.exists(filename):
+        print("No checkpoint " + filename + " found. Processing all files.")
+        return False
+    with open(filename, 'rb') as f:
+        state = pickle.load(f)
+    windows = [window.definition() for window in active_windows()]
+    if state.get("windows", None) != windows:
+        print("Warning: checkpoint " + filename + " was made with analysis windows " + str(state.get("windows", None)) + ". Processing all files.")
+        return False
 
-    for usr in all_users:
-        modfile_out.write(all_users[usr].to_string(utils.DELIMITER) + '\n')
-    modfile_out.close()
+    window_users = state["window_users"]
+    window_timelines = state["window_timelines"]
+    all_users = window_users[windows[0][0]]
+    lda_model = state["lda_model"]
+    last_comment_id = state["last_comment_id"]
+    last_prompt_id = state["last_prompt_id"]
+    print("Loaded checkpoint " + filename + " (last comment id " + str(last_comment_id) + ", last prompt id " + str(last_prompt_id) + ")")
+    return True
 
 
+def process_shards(comment_files, prompt_files, workers=None):
+    """
+    Process comments and prompts logfiles that were exported in pieces (e.g., per section or month)
+    without concatenating them first. One LDA model is trained on all the comments, then each shard
+    is processed by its own worker, counting its comments from zero. The workers' partial counts are
+    added together and their rows are written out in the order the shards were given.
+    :param comment_files: list of comments logfiles
+    :param prompt_files: list of prompts logfiles
+    :param workers: number of shards to process at once (default num_workers)
+    :return: None
+    """
+    global lda_model, last_comment_id, last_prompt_id
+    if workers is None:
+        workers = num_workers
+    run_profile.begin("shards")
+
+    # train one model on every shard, so all comments are scored with the same topics
+    sentences = []
+    with run_profile.step("tokenizing"):
+        for filename in comment_files:
+            sentences.extend(read_sentences(filename))
+    with run_profile.step("LDA training"):
+        lda_model = ldat(utils.NUM_LDA_TOPICS, sentences)
+
+    windows = active_windows()
+    shards = [("comments", filename, {window.suffix: part_filename() for window in windows}) for filename in comment_files]
+    shards += [("prompts", filename, {window.suffix: part_filename() for window in windows}) for filename in prompt_files]
+    users = {}
+    for uid, usr in all_users.items():  # workers start from users without any counts
+        users[uid] = copy.copy(usr)
+        users[uid].clear_counts()
+
+    with run_profile.step("workers") as workers_timing:
+        with multiprocessing.Pool(max(workers, 1), initializer=init_shard_worker, initargs=(users, lda_model, windows, timeline_windows, aggregation, csv_reader, consent)) as pool:
+            results = pool.map(process_shard, shards)  # results come back in the order of the shards
+
+    # reduce: add up the partial counts and stitch the shards' rows together
+    partial = {window.suffix: {} for window in windows}
+    for (kind, filename, parts), (kind, last_id, counts, timelines, quarantine_filename, report, timing) in zip(shards, results):
+        for suffix in partial:
+            user.merge_counts(partial[suffix], counts[suffix])
+            window_timelines[suffix].merge(timelines[suffix])
+        diagnostics_reports.append(report)
+        workers_timing.steps[filename] = profileSPOC.Timing(filename, run_profile)
+        workers_timing.steps[filename].merge(timing)
+        if kind == "comments":
+            last_comment_id = max(last_comment_id, last_id)
+        else:
+            last_prompt_id = max(last_prompt_id, last_id)
+        if os.path.exists(quarantine_filename):
+            with compressionSPOC.open_text(quarantine_filename, 'r', encoding="utf8") as quarantined:
+                rows = csv.reader(quarantined, delimiter=utils.DELIMITER)
+                next(rows)  # skip header row
+                for array_line in rows:
+                    quarantine.reject(array_line[0], array_line[1], array_line[2:])
+            os.remove(quarantine_filename)
+    for suffix, window_partial in partial.items():
+        for uid, counts in window_partial.items():
+            window_users[suffix][uid].add_counts(counts)
+
+    with run_profile.step("writing"):
+        for window in windows:
+            merge_parts([parts[window.suffix] for kind, filename, parts in shards if kind == "comments"], lda_filename(window), "utf8")
+            merge_parts([parts[window.suffix] for kind, filename, parts in shards if kind == "prompts"], prompts_filename(window), None)
+    run_profile.end()
+
+def part_filename():
+    """
+    :return: name of a new, empty temporary file for one shard's rows
+    """
+    handle, filename = tempfile.mkstemp(suffix=utils.FILE_EXTENSION, dir=utils.SPILL_DIR)
+    os.close(handle)
+    return filename
+
+def init_shard_worker(users, lda, windows, timelines, engine, reader, registry):
+    """
+    Set up a process to work on shards
+    :param users: dict uid -> UserSPOC, with all counts at zero
+    :param lda: trained LDAtopicModel
+    :param windows: analysis windows of the main process
+    :param timelines: timeline_windows of the main process
+    :param engine: aggregation of the main process
+    :param reader: csv_reader of the main process
+    :param registry: ConsentRegistry of the main process
+    :return: None
+    """
+    global all_users, lda_model, analysis_windows, timeline_windows, aggregation, csv_reader, output_format, consent, run_profile
+    all_users = users
+    run_profile = profileSPOC.RunProfile()  # times this process's shards, to send back to the main process
+    lda_model = lda
+    analysis_windows = windows
+    timeline_windows = timelines
+    aggregation = engine
+    csv_reader = reader
+    consent = registry
+    output_format = "csv"  # the main process writes the final output format
+
+def process_shard(shard):
+    """
+    Process one shard in a worker, writing each window's rows to a temporary CSV file
+    :param shard: ("comments" or "prompts", logfile, dict window suffix -> temporary file) tuple
+    :return: (kind, highest id processed, dict window suffix -> uid -> counts from this shard only,
+     dict window suffix -> Timelines from this shard only, quarantine file, warnings report, timings) tuple
+    """
+    global all_users, quarantine, last_comment_id, last_prompt_id, diagnostics_reports
+    kind, filename, out_filenames = shard
+    users = all_users
+    all_users = {}
+    for uid, usr in users.items():
+        all_users[uid] = copy.copy(usr)  # a worker can get more than one shard
+    start_windows()
+    quarantine = timestampSPOC.Quarantine(out_filenames[active_windows()[0].suffix] + ".quarantine")
+    last_comment_id = 0
+    last_prompt_id = 0
+    diagnostics_reports = []
+
+    if kind == "comments":
+        process_comments(filename, streaming=False, workers=1, lda=lda_model, out_filenames=out_filenames)
+        last_id = last_comment_id
+    else:
+        process_prompts(filename, out_filenames=out_filenames)
+        last_id = last_prompt_id
+    quarantine.close()
+
+    counts = {}
+    for suffix, shard_users in window_users.items():
+        counts[suffix] = {}
+        for uid, usr in shard_users.items():
+            if usr.counts() != users[uid].counts():
+                counts[suffix][uid] = usr.counts()
+    all_users = users
+    return kind, last_id, counts, window_timelines, quarantine.filename, diagnostics_reports[-1], run_profile.stages[-1].to_dict()
+
+def merge_parts(part_filenames, filename, encoding):
+    """
+    Write the rows of the shards' temporary CSV files to one output file, then delete them
+    :param part_filenames: list of temporary files, each with a header row
+    :param filename: output file
+    :param encoding: text encoding the parts were written with
+    :return: None
+    """
+    if len(part_filenames) < 1:
+        return
+    file_out = None
+    for part in part_filenames:
+        with compressionSPOC.open_text(part, 'r', encoding=encoding) as csvfile:
+            rows = csv.reader(csvfile, delimiter=utils.DELIMITER)
+            headers = next(rows)
+            if file_out is None:
+                file_out = columnar.open_writer(filename, headers, output_format, encoding=encoding)
+            file_out.writerows(rows)
+        os.remove(part)
+    file_out.close()
+    print("Done processing " + filename)
+
 def process_conditions(filename=utils.FILE_CONDITIONS+utils.FILE_EXTENSION):
     """
     Calculate the average per-user accuracy (user’s percentage correct / total problems done)
@@ -40,39 +381,33 @@ def process_conditions(filename=utils.FILE_CONDITIONS+utils.FILE_EXTENSION):
     :return: None
     """
     # --------------------
+    filename = compressionSPOC.find_file(filename)
     print("Processing " + filename)
+    run_profile.begin(filename)
+    num_rows = 0
 
-    with open(filename, 'r') as csvfile:
-        rows = csv.reader(csvfile, delimiter=utils.DELIMITER)
+    with compressionSPOC.open_text(filename, 'r') as csvfile:
+        rows = readerSPOC.read_rows(csvfile, csv_reader)
         headers = next(rows)  # skip first header row
         cleaned_headers = [s.replace(' ', '') for s in headers]
+        bind = schema.CONDITIONS.compile(cleaned_headers, filename)  # resolve column positions once
 
         for array_line in rows:
-            user_id = array_line[cleaned_headers.index(utils.COL_ID)]
-            num_comments = array_line[cleaned_headers.index(utils.COL_NUM_COMMENTS)]
-            voting_cond = array_line[cleaned_headers.index(utils.COL_VOTING)]
-            prompting_cond = array_line[cleaned_headers.index(utils.COL_PROMPTS)]
-            num_prompts = array_line[cleaned_headers.index(utils.COL_NUM_PROMPTS)]
-            num_upvotes = array_line[cleaned_headers.index(utils.COL_NUM_UPVOTES)]
-            num_downvotes = array_line[cleaned_headers.index(utils.COL_NUM_DOWNVOTES)]
-            assignments = []
-            assignment_lates = []
-            tot_late = array_line[cleaned_headers.index(utils.COL_TOT_LATE)]
-            exercises = []
-            exams = []
-            for i in range(0, len(utils.COL_ASSIGNMENTS)):  # iterating through assignment headers
-                score = array_line[cleaned_headers.index(utils.COL_ASSIGNMENTS[i])]
-                if len(score) < 1:
-                    score = ""
-                assignments.append(score)
-                assignment_lates.append(array_line[cleaned_headers.index(utils.COL_ASSIGN_LATE[i])])
-            for header in utils.COL_EXERCISE:  # iterating through exercise headers
-                score = array_line[cleaned_headers.index(header)]
-                if len(score) < 1:
-                    score = ""
-                exercises.append(score)
-            exams.extend([array_line[cleaned_headers.index(utils.COL_E1)], array_line[cleaned_headers.index(utils.COL_E1D)], array_line[cleaned_headers.index(utils.COL_E1F)], array_line[cleaned_headers.index(utils.COL_E2)]])
-            midterm = array_line[cleaned_headers.index(utils.COL_MIDGRADE)]
+            num_rows += 1
+            record = bind(array_line)
+            user_id = record.user_id
+            num_comments = record.num_comments
+            voting_cond = record.voting_cond
+            prompting_cond = record.prompting_cond
+            num_prompts = record.num_prompts
+            num_upvotes = record.num_upvotes
+            num_downvotes = record.num_downvotes
+            assignments = record.assignments
+            assignment_lates = record.assignment_lates
+            tot_late = record.tot_late
+            exercises = record.exercises
+            exams = record.exams
+            midterm = record.midgrade
 
             if int(num_prompts) < 1:  # had to have seen at least one prompt in order to be in a prompting condition!
                 prompting_cond = utils.COND_NO_PROMPT
@@ -89,194 +424,457 @@ def process_conditions(filename=utils.FILE_CONDITIONS+utils.FILE_EXTENSION):
                 all_users[user_id] = new_user
 
     csvfile.close()
+    start_windows()
+    run_profile.end(rows=num_rows)
     print("Done processing "+filename+"\n")
 
-def process_comments(filename=utils.FILE_POSTS+utils.FILE_EXTENSION):
+def read_comment_headers(rows, filename):
+    """
+    Read and clean the header row of a comments logfile
+    :param rows: iterator over the file's rows (see readerSPOC.read_rows), positioned at the start of the file
+    :param filename: name of the file, for error messages
+    :return: (cleaned headers, RowBinder for the file's rows) tuple
+    """
+    headers = next(rows)  # skip first header row
+    cleaned_headers = [s.replace(' ', '') for s in headers]  # removing spaces
+    del cleaned_headers[len(cleaned_headers)-1]  # last column header is blank for some reason
+    cleaned_headers.remove(utils.COL_ORIGINAL)  # this column is blank, remove it
+    bind = schema.COMMENTS.compile(cleaned_headers, filename)  # resolve column positions once
+    return cleaned_headers, bind
+
+def read_sentences(filename):
+    """
+    Read the bags of words to train the LDA topic model on from a comments logfile
+    :param filename: comments logfile
+    :return: list of bags of words, one per comment from a consenting student
+    """
+    sentences = []
+    with compressionSPOC.open_text(compressionSPOC.find_file(filename), 'r', encoding="utf8") as csvfile:
+        rows = readerSPOC.read_rows(csvfile, csv_reader, skipinitialspace=True)
+        cleaned_headers, bind = read_comment_headers(rows, filename)
+        for array_line in rows:
+            record = bind(array_line)
+            comment = record.comment
+            user_id = record.user_id
+
+            if len(comment) > 0 and is_consenting_student(user_id):  # only include comment in LDA model if student is consenting
+                sentences.append(ldat.to_bow(ldat.clean_string(comment)))
+    print("Done processing "+filename+"\n")
+    return sentences
+
+def lda_filename(window=None):
+    """
+    :param window: AnalysisWindow (default the first of the run's windows)
+    :return: name of the LDA file, for the output format and time range
+    """
+    if window is None:
+        window = active_windows()[0]
+    return columnar.output_filename(utils.LDA_FILE + window.suffix, output_format, output_compression)
+
+def prompts_filename(window=None):
+    """
+    :param window: AnalysisWindow (default the first of the run's windows)
+    :return: name of the modified prompts file, for the output format and time range
+    """
+    if window is None:
+        window = active_windows()[0]
+    return columnar.output_filename(utils.PROMPT_MOD + window.suffix, output_format, output_compression)
+
+def process_comments(filename=utils.FILE_POSTS+utils.FILE_EXTENSION, streaming=None, workers=None, lda=None, after_id=0, out_filenames=None):
     """
     Parses a CSV file with the students' comments, user ids, and timestamps and assigns an automated topic.
     IMPORTANT: Either all commas must be removed from the comment text beforehand, or some unique delimiter
     must be used instead of commas.
+    :param streaming: parse the file only once, spilling rows to disk for training and scoring (default is_streaming)
+    :param workers: number of processes to score comments with (default num_workers)
+    :param lda: an already trained LDAtopicModel, or None to train one on this file
+    :param after_id: only process comments with an id greater than this, appending them to the LDA file
+    :param out_filenames: dict window suffix -> file to write the window's scored comments to (default each window's LDA file)
     :return:
     """
+    global lda_model, last_comment_id, diagnostics
+    if streaming is None:
+        streaming = is_streaming
+    if workers is None:
+        workers = num_workers
+
+    filename = compressionSPOC.find_file(filename)
     print("Processing " + filename)
-    with open(filename, 'r', encoding="utf8") as csvfile:
-        rows = csv.reader(csvfile, delimiter=utils.DELIMITER, skipinitialspace=True)
-        headers = next(rows)  # skip first header row
-        cleaned_headers = [s.replace(' ', '') for s in headers]  # removing spaces
-        del cleaned_headers[len(cleaned_headers)-1]  # last column header is blank for some reason
-        cleaned_headers.remove(utils.COL_ORIGINAL)  # this column is blank, remove it
+    diagnostics = diagnosticsSPOC.Diagnostics(filename)
+    run_profile.begin(filename)
+    num_rows = 0
+    spill = None
+    with compressionSPOC.open_text(filename, 'r', encoding="utf8") as csvfile:
+        if lda is not None:
+            # the model is already trained, only need to read the comments once to score them
+            rows = readerSPOC.read_rows(csvfile, csv_reader)
+            cleaned_headers, bind = read_comment_headers(rows, filename)
+        elif streaming:
+            # reading comments in once, keeping each row and its bag of words in an on-disk spill
+            rows = readerSPOC.read_rows(csvfile, csv_reader)
+            cleaned_headers, bind = read_comment_headers(rows, filename)
 
-        # reading comments in initially and passing to LDA topic model
-        for array_line in rows:
-            comment = array_line[cleaned_headers.index(utils.COL_COMMENT)]
-            user_id = array_line[cleaned_headers.index(utils.COL_AUTHOR)]
+            spill = spillSPOC.CommentSpill()
+            with run_profile.step("tokenizing"):
+                for array_line in rows:
+                    record = bind(array_line)
+                    comment = record.comment.lstrip(' ')  # as if skipinitialspace
+                    user_id = record.user_id
 
-            if len(comment) > 0 and is_consenting_student(user_id):  # only include comment in LDA model if student is consenting
-                list_sentences.append(ldat.to_bow(ldat.clean_string(comment)))
-        print("Done processing "+filename+"\n")
+                    tokens = None
+                    if len(comment) > 0 and is_consenting_student(user_id):  # only include comment in LDA model if student is consenting
+                        tokens = ldat.to_bow(ldat.clean_string(comment))
+                    spill.append(array_line, tokens)
+            print("Done processing "+filename+"\n")
+
+            sentences = spill.sentences()
+            rows = spill.rows()  # replay the spill for scoring, instead of parsing the file again
+        else:
+            # reading comments in initially and passing to LDA topic model
+            with run_profile.step("tokenizing"):
+                list_sentences.extend(read_sentences(filename))
+            sentences = list_sentences
+
+            rows = readerSPOC.read_rows(csvfile, csv_reader)
+            cleaned_headers, bind = read_comment_headers(rows, filename)
 
         # preparing to output LDA topic analysis stuff
         print("\tProcessing " + utils.LDA_FILE+utils.FILE_EXTENSION)
-        csvfile.seek(0)  # start at beginning of file again
-        rows = csv.reader(csvfile, delimiter=utils.DELIMITER, lineterminator='\n')
-        headers = next(rows)  # skip first header row
 
         # load up LIWC libraries for quick sentiment analysis
         sentiment = liwc.liwc()
 
-        filename = utils.LDA_FILE+utils.FILE_EXTENSION
-        if is_only_second_half:
-            filename = utils.LDA_FILE + utils.MT_FILE + utils.FILE_EXTENSION
-        with open(filename, 'w', encoding="utf8") as csvout:
-            file_out = csv.writer(csvout, delimiter=utils.DELIMITER,quotechar='\"', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
-            new_headers = cleaned_headers
-            new_headers += ["num_days_after_post", "lecture_post_date", "lecture_week_num", utils.COMMENT_WORDS, utils.COMMENT_CHARS]
-            new_headers += [utils.LIWC_POSITIVE, utils.LIWC_NEGATIVE, utils.COL_LDA, utils.COL_HELP]
-            new_headers += ["mean_word_length", "median_word_length", utils.COL_COMMENTS_AFTER_PROMPT, utils.COL_COMMENTS_WEEK_AFTER, "is_3_days_after_prompt"]
-            for i in range(0, utils.NUM_LDA_TOPICS):  # topic headers for topic distribution scores
-                new_headers += ["topic_" + str(i)]
-            new_headers += user.UserSPOC.get_headers(utils.DELIMITER).split(utils.DELIMITER)
-            file_out.writerow(new_headers)
-
-            lda = ldat(utils.NUM_LDA_TOPICS, list_sentences)  # create topic model
+        windows = active_windows()
+        if out_filenames is None:
+            out_filenames = {window.suffix: lda_filename(window) for window in windows}
+
+        new_headers = cleaned_headers
+        new_headers += ["num_days_after_post", "lecture_post_date", "lecture_week_num", utils.COMMENT_WORDS, utils.COMMENT_CHARS]
+        new_headers += [utils.LIWC_POSITIVE, utils.LIWC_NEGATIVE, utils.COL_LDA, utils.COL_HELP]
+        new_headers += ["mean_word_length", "median_word_length", utils.COL_COMMENTS_AFTER_PROMPT, utils.COL_COMMENTS_WEEK_AFTER, "is_3_days_after_prompt"]
+        for i in range(0, utils.NUM_LDA_TOPICS):  # topic headers for topic distribution scores
+            new_headers += ["topic_" + str(i)]
+        new_headers += user.UserSPOC.get_headers(utils.DELIMITER).split(utils.DELIMITER)
+
+        with contextlib.ExitStack() as writers:
+            file_outs = {}  # window suffix -> writer for the window's LDA file
+            for window in windows:
+                out_filename = out_filenames[window.suffix]
+                is_appending = after_id > 0 and os.path.exists(out_filename)  # merging new comments into an earlier run's output
+                file_outs[window.suffix] = writers.enter_context(columnar.open_writer(out_filename, new_headers, output_format, append=is_appending))
+            if lda is None:
+                with run_profile.step("LDA training"):
+                    lda = ldat(utils.NUM_LDA_TOPICS, sentences)  # create topic model
+            lda_model = lda
             count_consenting_crams = 0
 
+            # scoring comments is CPU-bound: ship the model and lexicons to a pool of processes once
+            pool = None
+            if workers > 1:
+                pool = multiprocessing.Pool(workers, initializer=init_scoring_worker, initargs=(lda, sentiment))
+            else:
+                init_scoring_worker(lda, sentiment)  # score in this process
+            batch_size = utils.SCORING_CHUNK_SIZE * max(workers, 1) * 2
+            pending = []  # (record, datestamp, windows) of punctual comments waiting to be scored, in file order
+            tables = None
+            if aggregation == "table":
+                tables = {window.suffix: aggregate.CommentTable() for window in windows}  # window suffix -> comments
+
             for array_line in rows:
-                user_id = array_line[cleaned_headers.index(utils.COL_AUTHOR)].strip()
-                parent_id = array_line[cleaned_headers.index(utils.COL_PARENT_ID)].strip()
-                tstamp = array_line[cleaned_headers.index(utils.COL_TIMESTAMP)].strip()
+                num_rows += 1
+                record = bind(array_line)
+                user_id = record.user_id.strip()
+                parent_id = record.parent_id.strip()
+                tstamp = record.tstamp.strip()
+                if user_id not in all_users or not is_consenting_student(user_id):  # this is a non-consenting student (although info is still public)
+                    diagnostics.warn("non_consenting_author", user_id)
+                    continue  # before the quarantine, which would keep the whole row
+
+                post_id = parse_id(record.post_id)
+                if post_id is None:
+                    if after_id > 0:  # can't tell if an earlier run processed it
+                        quarantine.reject(filename, "malformed " + utils.COL_ID + " '" + record.post_id + "'", array_line)
+                        continue
+                elif post_id <= after_id:  # already processed in an earlier run
+                    continue
+                else:
+                    last_comment_id = max(last_comment_id, post_id)
                 datestamp = get_timestamp(tstamp)
+                if datestamp is None:
+                    quarantine.reject(filename, "malformed " + utils.COL_TIMESTAMP + " '" + tstamp + "'", array_line)
+                    continue
 
-                if user_id not in all_users or not is_consenting_student(user_id):  # this is a non-consenting student (although info is still public)
-                    print("Warning: user_id " + str(user_id) + " from " + utils.LDA_FILE+utils.FILE_EXTENSION + " may not be consenting. Not writing.")
-                elif not is_during_experiment(datestamp):
-                    print("Warning: comment timestamp " + str(datestamp) + " from " + utils.LDA_FILE+utils.FILE_EXTENSION + " is not within date range of experiment. Not writing.")
-                    setattr(all_users[user_id], utils.BEFORE_EXP_COMMENTS, getattr(all_users[user_id],utils.BEFORE_EXP_COMMENTS) + 1)  # keep count of comments posted too late for each user
-                elif not is_near_posted(datestamp, parent_id):
+                if not is_during_experiment(datestamp):
+                    diagnostics.warn("before_experiment", user_id, timestamp=datestamp)
+                    for window in windows:  # counted in every window, whatever its dates
+                        if tables is None:
+                            usr = window_users[window.suffix][user_id]
+                            setattr(usr, utils.BEFORE_EXP_COMMENTS, getattr(usr, utils.BEFORE_EXP_COMMENTS) + 1)  # keep count of comments posted too late for each user
+                        else:
+                            tables[window.suffix].add(user_id, aggregate.BEFORE_EXPERIMENT)
+                elif not is_near_posted(datestamp, parent_id, user_id=user_id):
                     count_consenting_crams += 1
-                    setattr(all_users[user_id], utils.LATE_COMMENTS, getattr(all_users[user_id],utils.LATE_COMMENTS) + 1)  # keep count of comments posted too late for each user
-                    print("Warning: comment timestamp " + str(datestamp) + " from " + utils.LDA_FILE+utils.FILE_EXTENSION + " is not near posting date of lecture #" + parent_id + ". Not writing.")
-                else:
-                    comment = array_line[cleaned_headers.index(utils.COL_COMMENT)]
-                    post_id = array_line[cleaned_headers.index(utils.COL_ID)]
-                    slide = array_line[cleaned_headers.index(utils.COL_SLIDE)]
-                    num_upvotes = int(array_line[cleaned_headers.index(utils.COL_UPVOTES)])
-                    num_downvotes = array_line[cleaned_headers.index(utils.COL_DOWNVOTES)]
-                    edit_time = array_line[cleaned_headers.index(utils.COL_EDITED)].replace("0000-00-00 00:00:00","")  # removing invalid/null timestamps
-                    edit_user = array_line[cleaned_headers.index(utils.COL_EDITAUTHOR)]
-                    edit_reason = array_line[cleaned_headers.index(utils.COL_EDITREASON)]
-                    ptype = array_line[cleaned_headers.index(utils.COL_PARENTTYPE)]
-                    pid = array_line[cleaned_headers.index(utils.COL_PARENT_ID)]
-                    cols = [post_id,  "", tstamp, user_id, ptype, pid, slide, comment, num_upvotes, num_downvotes, edit_time, edit_user, edit_reason]
-
-                    topic_name = lda.predict_topic(comment)  # assign LDA topic
-                    topic_distribution_scores = lda.topic_distribution_scores_list(comment)
-                    is_help_request = is_help_topic(comment)  # determine if this is a help request
-
-                    comment_mean_word_length = sum(len(word) for word in comment.split())/len(comment.split())  # mean word length of comment
-                    word_lengths = []
-                    for word in comment.split():
-                        word_lengths.append(len(word))
-                    comment_median_word_length = median(word_lengths)  # median word length of comment
-
-                    # only process if we're including all valid dates
-                    if not is_only_second_half or (is_only_second_half and datestamp.date() > utils.CONST_MIDTERM):
-                        # add this to our count of legitimate/punctual comments
-                        setattr(all_users[user_id], utils.COL_NUM_LEGIT_COMMENTS, getattr(all_users[user_id],utils.COL_NUM_LEGIT_COMMENTS) + 1)
-
-                        # add this help request to our counts of student help requests
-                        if is_help_request and all_users.get(user_id, None) is not None:
-                            setattr(all_users[user_id], utils.COL_HELP_REQS, getattr(all_users[user_id],utils.COL_HELP_REQS) + 1)
-
-                        # count num comments before and after first prompt
-                        first_prompt = getattr(all_users[user_id], utils.COL_FIRST_PROMPT_DATE, None)
-                        is_after = ""
-                        if first_prompt is None or len(str(first_prompt)) < 1:
-                            # no first prompt, nothing to change
-                            setattr(all_users[user_id], utils.COL_COMMENTS_AFTER_PROMPT, "")
-                            setattr(all_users[user_id], utils.COL_COMMENTS_BEFORE_PROMPT, "")
-                        elif first_prompt <= datestamp:  # this comment is after the first prompt
-                            setattr(all_users[user_id], utils.COL_COMMENTS_AFTER_PROMPT, getattr(all_users[user_id],utils.COL_COMMENTS_AFTER_PROMPT) + 1)
-                            is_after = "y"
-                        elif first_prompt > datestamp:  # this comment is before the first prompt
-                            setattr(all_users[user_id], utils.COL_COMMENTS_BEFORE_PROMPT, getattr(all_users[user_id],utils.COL_COMMENTS_BEFORE_PROMPT) + 1)
-                            is_after = "n"
-
-                        # count num comments X weeks before and after first prompt
-                        first_prompt = getattr(all_users[user_id], utils.COL_FIRST_PROMPT_DATE, None)
-                        is_week_after = ""
-                        if first_prompt is None or len(str(first_prompt)) < 1:
-                            # no first prompt, nothing to change
-                            setattr(all_users[user_id], utils.COL_COMMENTS_WEEK_AFTER, "")
-                            setattr(all_users[user_id], utils.COL_COMMENTS_WEEK_BEFORE, "")
-                        elif is_on_posted(datestamp, first_prompt) > 0:  # this comment is X weeks AFTER first prompt
-                            setattr(all_users[user_id], utils.COL_COMMENTS_WEEK_AFTER, getattr(all_users[user_id], utils.COL_COMMENTS_WEEK_AFTER) + 1)
-                            is_week_after = "y"
-                        elif is_on_posted(datestamp, first_prompt) > -1:  # this comment is X weeks BEFORE the first prompt
-                            setattr(all_users[user_id], utils.COL_COMMENTS_WEEK_BEFORE, getattr(all_users[user_id], utils.COL_COMMENTS_WEEK_BEFORE) + 1)
-                            is_week_after = ""
-
-                        # count num comments X days after first prompt
-                        first_prompt = getattr(all_users[user_id], utils.COL_FIRST_PROMPT_DATE, None)
-                        is_three_after = ""
-                        if first_prompt is None or len(str(first_prompt)) < 1:
-                            # no first prompt, nothing to change
-                            is_three_after = ""
-                        elif is_on_posted(datestamp, first_prompt, 3) > 0:  # this comment is X days AFTER first prompt
-                            is_three_after = "y"
-                            setattr(all_users[user_id], utils.COL_COMMENTS_DAYS_AFTER, getattr(all_users[user_id], utils.COL_COMMENTS_DAYS_AFTER) + 1)
+                    for window in windows:
+                        if tables is None:
+                            usr = window_users[window.suffix][user_id]
+                            setattr(usr, utils.LATE_COMMENTS, getattr(usr, utils.LATE_COMMENTS) + 1)  # keep count of comments posted too late for each user
                         else:
-                            is_three_after = "n"
-
-                        # LIWC - count the number of positive/negative words in the comment
-                        num_positive, num_negative, num_comment_words = sentiment.count_sentiments(comment)
-                        # LIWC - add these counts to our student user
-                        if all_users.get(user_id, None) is not None:
-                            setattr(all_users[user_id], utils.LIWC_POSITIVE, getattr(all_users[user_id], utils.LIWC_POSITIVE) + num_positive)
-                            setattr(all_users[user_id], utils.LIWC_NEGATIVE, getattr(all_users[user_id], utils.LIWC_NEGATIVE) + num_negative)
-                            setattr(all_users[user_id], utils.COMMENT_CHARS, getattr(all_users[user_id], utils.COMMENT_CHARS) + len(comment))
-                            setattr(all_users[user_id], utils.COMMENT_WORDS, getattr(all_users[user_id], utils.COMMENT_WORDS) + num_comment_words)
-
-                        dict_ld = dict(utils.lecture_dates)
-                        # TODO: print to_counts_string() later
-                        line = cols
-                        line += [days_after(datestamp, parent_id), str(dict_ld[int(parent_id)]), str([y[0] for y in utils.lecture_dates].index(int(parent_id)))]
-                        line += [num_comment_words, len(comment), num_positive, num_negative, topic_name, str(is_help_request), comment_mean_word_length, comment_median_word_length]
-                        line += [is_after, is_week_after, is_three_after]
-                        line += topic_distribution_scores
-                        file_out.writerow(line + all_users[user_id].to_const_string(utils.DELIMITER).split(utils.DELIMITER))
+                            tables[window.suffix].add(user_id, aggregate.LATE)
+                    diagnostics.warn("late_comment", user_id, timestamp=datestamp, lecture_id=parent_id)
+                else:
+                    # only process if it's in one of the windows we're including, scoring it once for all of them
+                    in_windows = [window for window in windows if window.contains(datestamp.date())]
+                    if len(in_windows) > 0:
+                        pending.append((record, datestamp, in_windows))
+                        if len(pending) >= batch_size:
+                            write_scored_comments(pending, pool, file_outs, tables)
+                            pending = []
+            write_scored_comments(pending, pool, file_outs, tables)
+            if tables is not None:
+                for window in windows:
+                    aggregate.add_counts(tables[window.suffix], window_users[window.suffix])  # all users' counts at once
+
+            if pool is not None:
+                pool.close()
+                pool.join()
 
+        if spill is not None:
+            spill.close()
         csvfile.close()
+    run_profile.end(rows=num_rows)
 
-    print("Done processing " + filename)
-    print("\tNumber comments from consenting students occuring " + str(utils.WEEK_THRESHOLD) + "+ weeks after lecture posted: " + str(count_consenting_crams) + "\n")
+    for window in windows:
+        print("Done processing " + out_filenames[window.suffix])
+    if quarantine.count(filename) > 0:
+        print("\tNumber comments with malformed timestamps or ids (written to " + quarantine.filename + "): " + str(quarantine.count(filename)))
+    print("\tNumber comments from consenting students occuring " + str(utils.WEEK_THRESHOLD) + "+ weeks after lecture posted: " + str(count_consenting_crams))
+    report_diagnostics()
+
+def write_scored_comments(pending, pool, file_outs, tables=None):
+    """
+    Score a batch of punctual comments (in parallel, if given a pool), then add them to each
+    user's counts and write them out in their original order, in every window they're in
+    :param pending: list of (record, datestamp, list of AnalysisWindow) for each comment, in file order
+    :param pool: multiprocessing pool of scoring workers, or None to score in this process
+    :param file_outs: dict window suffix -> writer for the window's LDA file
+    :param tables: dict window suffix -> aggregate.CommentTable to collect the comments in, or None to count them one at a time
+    :return: None
+    """
+    comments = [record.comment for record, datestamp, in_windows in pending]
+    scoring = run_profile.step("scoring")  # time spent scoring, summed over the workers
+    if pool is None:
+        scores, timing = score_comment_chunk(comments)
+        scoring.merge(timing)
+    else:
+        chunks = [comments[i:i+utils.SCORING_CHUNK_SIZE] for i in range(0, len(comments), utils.SCORING_CHUNK_SIZE)]
+        scores = []
+        for chunk_scores, timing in pool.imap(score_comment_chunk, chunks):  # imap keeps the chunks in order
+            scores.extend(chunk_scores)
+            scoring.merge(timing)
+
+    lines = {suffix: [] for suffix in file_outs}  # window suffix -> lines, written together at the end of the batch
+    with run_profile.step("counting"):  # timed for the whole batch, not each comment
+        for (record, datestamp, in_windows), comment_scores in zip(pending, scores):
+            topic_name, topic_distribution_scores, is_help_request, comment_mean_word_length, comment_median_word_length, num_positive, num_negative, num_comment_words = comment_scores
+            user_id = record.user_id.strip()
+            parent_id = record.parent_id.strip()
+            tstamp = record.tstamp.strip()
+
+            comment = record.comment
+            post_id = record.post_id
+            slide = record.slide
+            num_upvotes = int(record.num_upvotes)
+            num_downvotes = record.num_downvotes
+            edit_time = record.edit_time.replace("0000-00-00 00:00:00","")  # removing invalid/null timestamps
+            edit_user = record.edit_user
+            edit_reason = record.edit_reason
+            ptype = record.ptype
+            pid = record.parent_id
+            cols = [post_id,  "", tstamp, user_id, ptype, pid, slide, comment, num_upvotes, num_downvotes, edit_time, edit_user, edit_reason]
+
+            for window in in_windows:
+                if len(timeline_windows) > 0:
+                    window_timelines[window.suffix].add_comment(user_id, datestamp)
+                if tables is None:
+                    count_punctual_comment(window_users[window.suffix][user_id], datestamp, is_help_request, num_positive, num_negative, len(comment), num_comment_words)
+                else:
+                    tables[window.suffix].add(user_id, aggregate.PUNCTUAL, datestamp, is_help_request, num_positive, num_negative, len(comment), num_comment_words)
+            is_after, is_week_after, is_three_after = prompt_flags(datestamp, getattr(all_users[user_id], utils.COL_FIRST_PROMPT_DATE, None))
+
+            # TODO: print to_counts_string() later
+            lecture_id = int(parent_id)
+            line = cols
+            line += [lecture_calendar.days_after(datestamp, lecture_id), lecture_calendar.date_string(lecture_id), str(lecture_calendar.week_num(lecture_id))]
+            line += [num_comment_words, len(comment), num_positive, num_negative, topic_name, str(is_help_request), comment_mean_word_length, comment_median_word_length]
+            line += [is_after, is_week_after, is_three_after]
+            line += topic_distribution_scores
+            line += all_users[user_id].const_columns()  # cached, and fields with commas stay whole
+            for window in in_windows:
+                lines[window.suffix].append(line)
+
+    with run_profile.step("writing"):
+        for suffix, file_out in file_outs.items():
+            file_out.writerows(lines[suffix])
 
-def process_prompts(filename=utils.FILE_PROMPTS+utils.FILE_EXTENSION):
+def count_punctual_comment(usr, datestamp, is_help_request, num_positive, num_negative, num_chars, num_comment_words):
+    """
+    Add one punctual comment to its user's counts
+    :param usr: UserSPOC who posted the comment
+    :param datestamp: datetime the comment was posted
+    :param is_help_request: True if the comment asks for help
+    :param num_positive: number of LIWC positive words in the comment
+    :param num_negative: number of LIWC negative words in the comment
+    :param num_chars: length of the comment
+    :param num_comment_words: number of words in the comment
+    :return: None
+    """
+    # add this to our count of legitimate/punctual comments
+    setattr(usr, utils.COL_NUM_LEGIT_COMMENTS, getattr(usr, utils.COL_NUM_LEGIT_COMMENTS) + 1)
+
+    # add this help request to our counts of student help requests
+    if is_help_request:
+        setattr(usr, utils.COL_HELP_REQS, getattr(usr, utils.COL_HELP_REQS) + 1)
+
+    # count num comments before and after first prompt, and X weeks/days before and after it
+    offset = prompt_offset(datestamp, getattr(usr, utils.COL_FIRST_PROMPT_DATE, None))
+    if offset is None:
+        # no first prompt, nothing to change
+        setattr(usr, utils.COL_COMMENTS_AFTER_PROMPT, "")
+        setattr(usr, utils.COL_COMMENTS_BEFORE_PROMPT, "")
+        setattr(usr, utils.COL_COMMENTS_WEEK_AFTER, "")
+        setattr(usr, utils.COL_COMMENTS_WEEK_BEFORE, "")
+    elif offset >= 0:  # this comment is after the first prompt
+        setattr(usr, utils.COL_COMMENTS_AFTER_PROMPT, getattr(usr, utils.COL_COMMENTS_AFTER_PROMPT) + 1)
+        if offset <= 7:  # this comment is X weeks AFTER first prompt
+            setattr(usr, utils.COL_COMMENTS_WEEK_AFTER, getattr(usr, utils.COL_COMMENTS_WEEK_AFTER) + 1)
+        if offset <= 3:  # this comment is X days after first prompt
+            setattr(usr, utils.COL_COMMENTS_DAYS_AFTER, getattr(usr, utils.COL_COMMENTS_DAYS_AFTER) + 1)
+    else:  # this comment is before the first prompt
+        setattr(usr, utils.COL_COMMENTS_BEFORE_PROMPT, getattr(usr, utils.COL_COMMENTS_BEFORE_PROMPT) + 1)
+        if offset >= -7:  # this comment is X weeks BEFORE the first prompt
+            setattr(usr, utils.COL_COMMENTS_WEEK_BEFORE, getattr(usr, utils.COL_COMMENTS_WEEK_BEFORE) + 1)
+
+    # LIWC - add these counts to our student user
+    setattr(usr, utils.LIWC_POSITIVE, getattr(usr, utils.LIWC_POSITIVE) + num_positive)
+    setattr(usr, utils.LIWC_NEGATIVE, getattr(usr, utils.LIWC_NEGATIVE) + num_negative)
+    setattr(usr, utils.COMMENT_CHARS, getattr(usr, utils.COMMENT_CHARS) + num_chars)
+    setattr(usr, utils.COMMENT_WORDS, getattr(usr, utils.COMMENT_WORDS) + num_comment_words)
+
+def prompt_flags(datestamp, first_prompt):
+    """
+    Where a comment falls relative to its user's first prompt, for the LDA file
+    :param datestamp: datetime the comment was posted
+    :param first_prompt: datetime of the user's first prompt, or "" if they never got one
+    :return: (is after prompt, is within a week after, is within 3 days after) tuple of "y", "n" or ""
+    """
+    offset = prompt_offset(datestamp, first_prompt)
+    if offset is None:
+        return "", "", ""
+    is_after = "y" if offset >= 0 else "n"
+    is_week_after = "y" if 0 <= offset <= 7 else ""
+    is_three_after = "y" if 0 <= offset <= 3 else "n"
+    return is_after, is_week_after, is_three_after
+
+def prompt_offset(datestamp, first_prompt):
+    """
+    :param datestamp: datetime a comment was posted
+    :param first_prompt: datetime of the user's first prompt, or "" if they never got one
+    :return: number of days the comment was posted after the first prompt (negative if before), or None without a first prompt
+    """
+    if first_prompt is None or len(str(first_prompt)) < 1:
+        return None
+    return (datestamp.date() - first_prompt.date()).days
+
+def init_scoring_worker(lda, sentiment):
+    """
+    Set up the LDA model and LIWC lexicons used to score comments in this process
+    :param lda: a trained LDAtopicModel
+    :param sentiment: a loaded liwc object
+    :return: None
+    """
+    global scoring_lda, scoring_sentiment
+    scoring_lda = lda
+    scoring_sentiment = sentiment
+
+def score_comment_chunk(comments):
+    """
+    Score a chunk of comments with this process's LDA model and LIWC lexicons. Each step is
+    timed once for the whole chunk, so timing doesn't slow down scoring each comment.
+    :param comments: list of comment strings
+    :return: (list of score tuples, one per comment, timings of the scoring steps) tuple. Each score tuple is
+     (topic name, topic distribution scores, is help request, mean word length, median word length,
+     num positive words, num negative words, num words)
+    """
+    timing = profileSPOC.Timing("scoring", run_profile)
+    with timing:
+        with run_profile.step("tokenizing"):
+            comment_features = features.comment_features(comments)  # split each comment once, for every score
+        # LIWC - count the number of positive/negative words in every comment of the chunk at once
+        with run_profile.step("LIWC"):
+            num_positive, num_negative, num_words = scoring_sentiment.count_words_batch([f.liwc_words for f in comment_features])
+        with run_profile.step("LDA inference"):
+            topics = [f.topic_scores(scoring_lda) for f in comment_features]  # assign LDA topic
+        with run_profile.step("help requests"):
+            help_requests = [f.is_help_request() for f in comment_features]  # determine if this is a help request
+        with run_profile.step("word lengths"):
+            word_lengths = [f.word_lengths() for f in comment_features]  # mean and median word length of each comment
+        scores = [(topic_name, topic_distribution_scores, is_help_request, mean_length, median_length, positive, negative, words)
+                  for (topic_name, topic_distribution_scores), is_help_request, (mean_length, median_length), positive, negative, words
+                  in zip(topics, help_requests, word_lengths, num_positive.tolist(), num_negative.tolist(), num_words.tolist())]
+    return scores, timing.to_dict()
+
+def process_prompts(filename=utils.FILE_PROMPTS+utils.FILE_EXTENSION, after_id=0, out_filenames=None):
     """
     Parses a CSV file with the students' received prompts. MUST BE SORTED BY TIMESTAMP
+    :param after_id: only process prompts with an id greater than this, appending them to the prompts file
+    :param out_filenames: dict window suffix -> file to write the window's prompts to (default each window's prompts file)
     :return:
     """
+    global last_prompt_id, diagnostics
+    filename = compressionSPOC.find_file(filename)
     print("Processing " + filename)
-    with open(filename, 'r') as csvfile:
-        rows = csv.reader(csvfile, delimiter=utils.DELIMITER)
+    diagnostics = diagnosticsSPOC.Diagnostics(filename)
+    run_profile.begin(filename)
+    num_rows = 0
+    with compressionSPOC.open_text(filename, 'r') as csvfile:
+        rows = readerSPOC.read_rows(csvfile, csv_reader)
         headers = next(rows)  # skip first header row
         cleaned_headers = [s.replace(' ', '') for s in headers]  # removing spaces
         cleaned_headers += ["recip0", "recip1"]  # splitting recipients into separate columns
+        bind = schema.PROMPTS.compile(cleaned_headers, filename)  # resolve column positions once
+        recipients_index = bind.index("recipients")
 
-        filename = utils.PROMPT_MOD+utils.FILE_EXTENSION
-        if is_only_second_half:
-            filename = utils.PROMPT_MOD + utils.MT_FILE + utils.FILE_EXTENSION
-        with open(filename, 'w') as csvout:
-            file_out = csv.writer(csvout, delimiter=utils.DELIMITER,quotechar='\"', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
-            file_out.writerow(cleaned_headers)
-
+        windows = active_windows()
+        is_dated = any(window.is_bounded() for window in windows)  # only need the prompts' dates if some windows leave some out
+        is_anchor = any(window.anchor == "prompts" for window in timeline_windows)  # or if some timeline windows count from them
+        if out_filenames is None:
+            out_filenames = {window.suffix: prompts_filename(window) for window in windows}
+        with contextlib.ExitStack() as writers:
+            file_outs = {}  # window suffix -> writer for the window's prompts file
+            for window in windows:
+                out_filename = out_filenames[window.suffix]
+                is_appending = after_id > 0 and os.path.exists(out_filename)  # merging new prompts into an earlier run's output
+                file_outs[window.suffix] = writers.enter_context(columnar.open_writer(out_filename, cleaned_headers, output_format, append=is_appending, encoding=None))
             for array_line in rows:
-                author_id = array_line[cleaned_headers.index(utils.COL_AUTHOR_ID)]
-                recipients = array_line[cleaned_headers.index(utils.COL_RECIPIENTS)].split(utils.DELIMITER)
-                timestamp = array_line[cleaned_headers.index(utils.COL_TSTAMP)]
+                num_rows += 1
+                record = bind(array_line)
+                author_id = record.author_id
+                recipients = record.recipients.split(utils.DELIMITER)
+                timestamp = record.timestamp
+
+                prompt_id = parse_id(record.prompt_id)
+                if prompt_id is None:
+                    if after_id > 0:  # can't tell if an earlier run processed it
+                        masked = list(array_line)
+                        masked[recipients_index] = utils.DELIMITER.join(mask_recipients(recipients))
+                        quarantine.reject(filename, "malformed " + utils.COL_ID + " '" + record.prompt_id + "'", masked)
+                        continue
+                elif prompt_id <= after_id:  # already processed in an earlier run
+                    continue
+                else:
+                    last_prompt_id = max(last_prompt_id, prompt_id)
 
                 """# Don't need to store these
-                prompt_id = array_line[cleaned_headers.index(utils.COL_ID)]
                 parent_type = array_line[cleaned_headers.index(utils.COL_PARENTTYPE)]
                 parent_id = array_line[cleaned_headers.index(utils.COL_PARENT_ID)]
                 author_id = array_line[cleaned_headers.index(utils.COL_AUTHOR_ID)]
@@ -287,57 +885,82 @@ def process_prompts(filename=utils.FILE_PROMPTS+utils.FILE_EXTENSION):
                 """
 
                 # only process/write if during valid dates
-                if not is_only_second_half or (is_only_second_half and get_timestamp(timestamp).date() > utils.CONST_MIDTERM):
-                    # removing non-consenting prompt recipients
-                    consenting = []
+                in_windows = windows
+                datestamp = None
+                if is_dated or is_anchor:
+                    datestamp = get_timestamp(timestamp)
+                if is_dated:
+                    if datestamp is None:
+                        masked = list(array_line)  # the quarantine only keeps consenting recipients too
+                        masked[recipients_index] = utils.DELIMITER.join(mask_recipients(recipients))
+                        quarantine.reject(filename, "malformed " + utils.COL_TSTAMP + " '" + timestamp + "'", masked)
+                        continue
+                    in_windows = [window for window in windows if window.contains(datestamp.date())]
+                if is_anchor and datestamp is not None:
                     for recip in recipients:
                         recip = recip.replace(' ', '')
                         if is_consenting_student(recip):
-                            consenting.append(recip)
-                        else:
-                            print("Warning: recipient of prompt (" + str(recip) + ") from " + utils.PROMPT_MOD+utils.FILE_EXTENSION + " not consenting.")
-                            consenting.append("non_consent")
-                    consenting.sort()
-                    array_line[cleaned_headers.index(utils.COL_RECIPIENTS)] = utils.DELIMITER.join(consenting)
+                            for window in windows:  # every prompt is an anchor, even outside the window
+                                window_timelines[window.suffix].add_prompt(recip, datestamp)
+                if len(in_windows) > 0:
+                    consenting = mask_recipients(recipients, warn=True)
+                    array_line[recipients_index] = utils.DELIMITER.join(consenting)
                     array_line += consenting
-                    file_out.writerow(array_line)  # only writing consenting students' data
+                    for window in in_windows:
+                        file_outs[window.suffix].writerow(array_line)  # only writing consenting students' data
         csvfile.close()
-    print("Done processing " + filename)
+    run_profile.end(rows=num_rows)
+    for window in windows:
+        print("Done processing " + out_filenames[window.suffix])
+    if quarantine.count(filename) > 0:
+        print("\tNumber prompts with malformed timestamps or ids (written to " + quarantine.filename + "): " + str(quarantine.count(filename)))
+    report_diagnostics()
 
-def median(x):
-  """
-  Takes in a list of numbers and output the middle number
-  """
-  if len(x) < 1:
-      return 0
-  x.sort()  # after taking the list, sort it
-  return (x[int(len(x)/2)])
+def parse_id(value):
+    """
+    :param value: a comment or prompt id from the logfiles
+    :return: the id as an int, or None if it isn't a number
+    """
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+def mask_recipients(recipients, warn=False):
+    """
+    Remove the non-consenting students from a prompt's recipients
+    :param recipients: list of recipient ids, as split from the logfile
+    :param warn: if True, warn about each non-consenting recipient
+    :return: sorted list of the consenting recipients' ids, with "non_consent" in place of the others
+    """
+    consenting = []
+    for recip in recipients:
+        recip = recip.replace(' ', '')
+        if is_consenting_student(recip):
+            consenting.append(recip)
+        else:
+            if warn:
+                diagnostics.warn("non_consenting_recipient", recip)
+            consenting.append("non_consent")
+    consenting.sort()
+    return consenting
 
-def is_help_topic(sentence):
+def report_diagnostics():
     """
-    Determine if the given string (message post) contains a question or help request.
-    :param sentence: a string sentence / message post
-    :return: True if the string is about help seeking
+    Print the summary of the current stage's warnings and keep them for the JSON report
+    :return: None
     """
-    # TODO: this is a super naive way to determine this
-    if "help" in sentence or "question" in sentence or "?" in sentence or "dunno" in sentence or "n't know" in sentence:
-        return True
-    if "confus" in sentence or "struggl" in sentence or "lost" in sentence or "stuck" in sentence or "know how" in sentence:
-        return True
-    return False
+    print(diagnostics.summary() + "\n")
+    diagnostics_reports.append(diagnostics.to_dict())
 
 def get_timestamp(tstamp):
     """
     Clean the timestamp from a string in the logfiles
     Format: 2015-01-12 14:28:58
     :param tstamp: string containing the timestamp
-    :return: the datetime object
+    :return: the datetime object, or None if the timestamp is malformed
     """
-    try:
-        tstamp = datetime.datetime.strptime(tstamp, '%Y-%m-%d %H:%M:%S')
-    except ValueError as err:
-        print(tstamp, err)
-    return tstamp
+    return timestampSPOC.parse_timestamp(tstamp)
 
 def is_during_experiment(comment_date, first_day=utils.CONST_FIRST_DAY, last_day=utils.CONST_LAST_DAY):
     """
@@ -354,25 +977,25 @@ def is_during_experiment(comment_date, first_day=utils.CONST_FIRST_DAY, last_day
         print("ERROR:: logfileSPOC.is_during_experiment(): Cannot process date: " + comment_date)
         return False
 
-def is_near_posted(comment_date, lecture_id, num_weeks=utils.WEEK_THRESHOLD):
+def is_near_posted(comment_date, lecture_id, num_weeks=utils.WEEK_THRESHOLD, user_id=None):
     """
     Determine if given date is within num_weeks of lecture_id
     :param comment_date: date to check if it's in range
     :param lecture_id: id number of lecture the comment date belongs to
     :param num_weeks: number of weeks comment must be posted to lecture within
+    :param user_id: user who posted the comment, for warnings
     :return: True if given date is in our restricted time range
     """
-    dict_ld = dict(utils.lecture_dates)
-    if int(lecture_id) not in dict_ld:  # there's three comments on a lecture that does not exist
+    window = lecture_calendar.window(lecture_id, num_weeks)
+    if window is None:  # there's three comments on a lecture that does not exist
         return False
-    first_day = dict_ld[int(lecture_id)]
-    last_day = first_day + datetime.timedelta(weeks=num_weeks)
+    first_day, last_day = window
 
     if comment_date is not None:
         if last_day >= comment_date.date() >= first_day:
             return True
         elif first_day > comment_date.date():
-            print("WARNING: Comment was posted BEFORE lecture was posted: " + str(first_day) + " > " + str(comment_date))
+            diagnostics.warn("before_lecture", user_id, first_day=first_day, timestamp=comment_date)
         else:  # Not in given course date range
             return False
     else:
@@ -409,13 +1032,11 @@ def days_after(comment_date, lecture_id):
     :param lecture_id: id number of lecture the comment date belongs to
     :return: True if given date is in our restricted time range
     """
-    dict_ld = dict(utils.lecture_dates)
-    if int(lecture_id) not in dict_ld:  # there's three comments on a lecture that does not exist
+    if not lecture_calendar.has_lecture(lecture_id):  # there's three comments on a lecture that does not exist
         return ""
-    lecture_date = dict_ld[int(lecture_id)]
 
     if comment_date is not None:
-        return (comment_date.date() - lecture_date).days
+        return lecture_calendar.days_after(comment_date, lecture_id)
     else:
         print("ERROR:: logfileSPOC.days_after(): Cannot process date: " + comment_date)
         return ""
@@ -426,8 +1047,44 @@ def is_consenting_student(user_id):
     :param user_id: a user id to check
     :return: True if user is consenting
     """
-    return int(user_id) not in utils.DROP_STUDENTS and int(user_id) in utils.CONSENTING_STUDENTS
+    return consent.is_consenting(user_id)
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Parse the SPOC logfiles and output modified versions of them")
+    parser.add_argument('--workers', type=int, default=num_workers, help="number of processes to score comments with")
+    parser.add_argument('--streaming', action='store_true', help="parse the comments file once, spilling it to disk")
+    parser.add_argument('--incremental', action='store_true', help="only process comments/prompts added since the last checkpoint")
+    parser.add_argument('--format', choices=sorted(columnar.EXTENSIONS), default=output_format, help="format of the output files")
+    parser.add_argument('--compress', choices=sorted(compressionSPOC.COMPRESSIONS), default=output_compression or None, help="compress the CSV output files")
+    parser.add_argument('--reader', choices=readerSPOC.BACKENDS, default=csv_reader, help="parser for the logfiles (pandas and pyarrow read in chunks)")
+    parser.add_argument('--comments', nargs='+', help="comments logfile(s) to process as shards, instead of the one in utilsSPOC")
+    parser.add_argument('--prompts', nargs='+', help="prompts logfile(s) to process as shards, instead of the one in utilsSPOC")
+    parser.add_argument('--roster', help="file of consenting student ids, instead of utilsSPOC.CONSENTING_STUDENTS")
+    parser.add_argument('--drop-list', help="file of dropped student ids, instead of utilsSPOC.DROP_STUDENTS")
+    parser.add_argument('--diagnostics', default=diagnostics_file, help="JSON file to write a report of the warnings to")
+    parser.add_argument('--timings', default=timings_file, help="JSON file to write the time each stage took to")
+    parser.add_argument('--trace-memory', action='store_true', help="record each stage's peak memory (slower)")
+    parser.add_argument('--profile', default=profile_file, help="file to write cProfile stats of the whole run to")
+    parser.add_argument('--aggregation', choices=["rows", "table"], default=aggregation, help="count users' comments one at a time or all at once")
+    parser.add_argument('--window', action='append', type=windowSPOC.parse_window, help="analysis window to write outputs for: 'full', 'mid' or 'suffix:YYYY-MM-DD:YYYY-MM-DD' (repeat for more than one)")
+    parser.add_argument('--timeline-window', action='append', type=timelineSPOC.parse_window, help="extra _mod column counting comments near prompts or lectures: 'column:anchor:first offset:last offset' (repeat for more than one)")
+    args = parser.parse_args()
+    output_format = args.format
+    output_compression = args.compress or ""
+    aggregation = args.aggregation
+    csv_reader = args.reader
+    if args.timeline_window is not None:
+        timeline_windows = args.timeline_window
+    diagnostics_file = args.diagnostics
+    timings_file = args.timings
+    profile_file = args.profile
+    if args.trace_memory:
+        run_profile = profileSPOC.RunProfile(trace_memory=True)
+    num_workers = args.workers
+    is_streaming = is_streaming or args.streaming
+    is_incremental = is_incremental or args.incremental
+    if args.roster is not None or args.drop_list is not None:
+        consent = consentSPOC.ConsentRegistry(roster_file=args.roster or utils.ROSTER_FILE, drop_file=args.drop_list or utils.DROP_FILE)
+
     print("Running logfileSPOC")
-    run()
\ No newline at end of file
+    run(comment_files=args.comments, prompt_files=args.prompts, windows=args.window)
\ No newline at end of file
@@ -0,0 +1,197 @@
+__author__ = 'IH'
+__project__ = 'spoc-file-processing'
+
+"""
+This profileSPOC file records how long each stage of processing takes (and each step within it,
+e.g., training the LDA model), how many rows per second it processes and, optionally, its peak
+memory use, for a JSON summary of a run
+"""
+
+import json
+import time
+import tracemalloc
+
+class Timing(object):
+    """
+    The time spent in one stage or step, over every time it was entered. Use in a with statement.
+    """
+    __slots__ = ('name', 'seconds', 'calls', 'rows', 'peak_bytes', 'steps', 'profile', 'started')
+
+    def __init__(self, name, profile):
+        """
+        :param name: name of the stage or step
+        :param profile: the RunProfile this belongs to
+        :return: None
+        """
+        self.name = name
+        self.seconds = 0.0
+        self.calls = 0
+        self.rows = None  # number of rows processed, if it's a stage
+        self.peak_bytes = None  # peak traced memory, if tracing memory
+        self.steps = {}  # step name -> Timing, in the order they were first entered
+        self.profile = profile
+        self.started = 0.0
+
+    def __enter__(self):
+        self.profile.open_timing(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.seconds += time.perf_counter() - self.started
+        self.calls += 1
+        self.profile.close_timing(self)
+
+    def merge(self, summary):
+        """
+        Add the times from another process's summary of this stage or step (see to_dict)
+        :param summary: dict from Timing.to_dict()
+        :return: None
+        """
+        self.seconds += summary["seconds"]
+        self.calls += summary["calls"]
+        if "rows" in summary:
+            self.rows = (self.rows or 0) + summary["rows"]
+        for name, step in summary.get("steps", {}).items():
+            if name not in self.steps:
+                self.steps[name] = Timing(name, self.profile)
+            self.steps[name].merge(step)
+
+    def to_dict(self):
+        """
+        :return: this stage or step's times, rates and steps as a dict
+        """
+        summary = {"seconds": round(self.seconds, 6), "calls": self.calls}
+        if self.rows is not None:
+            summary["rows"] = self.rows
+            summary["rows_per_second"] = round(self.rows / self.seconds, 1) if self.seconds > 0 else None
+        if self.peak_bytes is not None:
+            summary["peak_bytes"] = self.peak_bytes
+        if len(self.steps) > 0:
+            summary["steps"] = {name: step.to_dict() for name, step in self.steps.items()}
+        return summary
+
+class RunProfile(object):
+    """
+    The stages of one run, each with its steps. A step is timed within whatever stage or step is
+    currently open; with nothing open (e.g., in a worker process that hasn't started a stage), it's not timed.
+    """
+    def __init__(self, trace_memory=False):
+        """
+        :param trace_memory: record each stage and step's peak memory with tracemalloc (slows the run down)
+        :return: None
+        """
+        self.trace_memory = trace_memory
+        self.stages = []  # Timing of each stage, in order
+        self.open = []  # stack of the stages/steps currently being timed
+        self.unused = Timing("", self)  # stands in for steps outside of any stage
+
+    def start(self):
+        """
+        Start tracing memory, if asked to
+        :return: None
+        """
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stop(self):
+        """
+        Stop tracing memory
+        :return: None
+        """
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def begin(self, name):
+        """
+        Start timing a new stage. Stages can't be nested.
+        :param name: name of the stage
+        :return: the stage's Timing
+        """
+        stage = Timing(name, self)
+        self.stages.append(stage)
+        stage.__enter__()
+        return stage
+
+    def end(self, rows=None):
+        """
+        Stop timing the current stage
+        :param rows: number of rows the stage processed
+        :return: None
+        """
+        stage = self.stages[-1]
+        stage.rows = rows
+        stage.__exit__(None, None, None)
+
+    def step(self, name):
+        """
+        :param name: name of a step in the currently open stage or step
+        :return: the step's Timing, to use in a with statement
+        """
+        if len(self.open) < 1:
+            return self.unused
+        parent = self.open[-1]
+        timing = parent.steps.get(name, None)
+        if timing is None:
+            timing = Timing(name, self)
+            parent.steps[name] = timing
+        return timing
+
+    def current(self):
+        """
+        :return: Timing of the innermost stage or step currently open, or None
+        """
+        return self.open[-1] if len(self.open) > 0 else None
+
+    def open_timing(self, timing):
+        if timing is self.unused:
+            return
+        if self.trace_memory and tracemalloc.is_tracing():
+            peak = tracemalloc.get_traced_memory()[1]
+            for parent in self.open:  # the peak so far belongs to every open timing, before it's reset for this one
+                parent.peak_bytes = max(parent.peak_bytes or 0, peak)
+            tracemalloc.reset_peak()
+        self.open.append(timing)
+
+    def close_timing(self, timing):
+        if timing is self.unused:
+            return
+        self.open.pop()
+        if self.trace_memory and tracemalloc.is_tracing():
+            peak = tracemalloc.get_traced_memory()[1]
+            for t in self.open + [timing]:
+                t.peak_bytes = max(t.peak_bytes or 0, peak)
+
+    def to_dict(self):
+        """
+        :return: every stage's times, rates and steps as a list of dicts
+        """
+        return [dict(stage=stage.name, **stage.to_dict()) for stage in self.stages]
+
+    def summary(self):
+        """
+        :return: one line per stage and step, indented by depth
+        """
+        lines = []
+        def add_lines(timing, depth):
+            line = "\t" + "  " * depth + timing.name + ": " + "{:.3f}".format(timing.seconds) + "s"
+            if timing.rows is not None and timing.seconds > 0:
+                line += ", " + str(timing.rows) + " rows (" + "{:.1f}".format(timing.rows / timing.seconds) + " rows/s)"
+            if timing.peak_bytes is not None:
+                line += ", peak " + "{:.1f}".format(timing.peak_bytes / 2**20) + " MB"
+            lines.append(line)
+            for step in timing.steps.values():
+                add_lines(step, depth + 1)
+        for stage in self.stages:
+            add_lines(stage, 0)
+        return "\n".join(lines)
+
+    def write_report(self, filename):
+        """
+        Write every stage's times, rates and steps to a JSON file
+        :param filename: JSON file to write
+        :return: None
+        """
+        with open(filename, 'w', encoding="utf8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        print("Wrote timings report " + filename)
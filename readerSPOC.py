@@ -0,0 +1,87 @@
+__author__ = 'IH'
+__project__ = 'spoc-file-processing'
+
+"""
+This readerSPOC file reads the rows of a logfile with one of several CSV parsers: Python's csv
+module (the default), pandas in chunks, or pyarrow's multithreaded reader in record batches.
+Whichever parser is used, rows come back the way csv.reader gives them: the header row first,
+then each row as a list of strings.
+"""
+
+import csv
+import itertools
+import utilsSPOC as utils
+
+BACKENDS = ("csv", "pandas", "pyarrow")
+MAX_COLUMNS = 1024  # pyarrow names the columns f0, f1, ...: read up to this many of them as strings
+
+def read_rows(csvfile, backend=utils.CSV_READER, skipinitialspace=False, chunk_size=utils.CSV_CHUNK_SIZE):
+    """
+    Read the rows of a CSV file, header row included
+    :param csvfile: text file object, positioned at the header row
+    :param backend: "csv", "pandas" or "pyarrow" (falls back to "pandas" if pyarrow isn't installed)
+    :param skipinitialspace: ignore spaces after each delimiter, like csv.reader(skipinitialspace=True)
+    :param chunk_size: number of rows the chunked parsers read at a time
+    :return: iterator over the rows, each a list of strings
+    """
+    if backend == "csv":
+        return csv.reader(csvfile, delimiter=utils.DELIMITER, skipinitialspace=skipinitialspace, lineterminator='\n')
+    return itertools.chain.from_iterable(read_batches(csvfile, backend, skipinitialspace, chunk_size))
+
+def read_batches(csvfile, backend=utils.CSV_READER, skipinitialspace=False, chunk_size=utils.CSV_CHUNK_SIZE):
+    """
+    Read the rows of a CSV file a batch at a time, header row included
+    :param csvfile: text file object, positioned at the header row
+    :param backend: "csv", "pandas" or "pyarrow"
+    :param skipinitialspace: ignore spaces after each delimiter
+    :param chunk_size: number of rows in each batch
+    :return: iterator over lists of rows, each row a list of strings
+    """
+    if backend not in BACKENDS:
+        raise ValueError("Unknown CSV reader '" + str(backend) + "'. Expected one of " + str(BACKENDS))
+    if backend == "pyarrow" and (skipinitialspace or not has_pyarrow()):
+        backend = "pandas"  # pyarrow can't skip spaces before a quoted value
+    if backend == "pyarrow":
+        return pyarrow_batches(csvfile, chunk_size)
+    if backend == "pandas":
+        return pandas_batches(csvfile, skipinitialspace, chunk_size)
+    rows = csv.reader(csvfile, delimiter=utils.DELIMITER, skipinitialspace=skipinitialspace, lineterminator='\n')
+    return iter(lambda: list(itertools.islice(rows, chunk_size)), [])
+
+def has_pyarrow():
+    """
+    :return: True if pyarrow is installed
+    """
+    try:
+        import pyarrow.csv
+    except ImportError:
+        return False
+    return True
+
+def pandas_batches(csvfile, skipinitialspace, chunk_size):
+    """
+    Read a CSV file in chunks with pandas' C parser, every value as a string
+    :return: iterator over lists of rows
+    """
+    import pandas as pd
+    chunks = pd.read_csv(csvfile, sep=utils.DELIMITER, header=None, dtype=object, na_filter=False, keep_default_na=False,
+                         skipinitialspace=skipinitialspace, skip_blank_lines=False, chunksize=chunk_size)
+    for chunk in chunks:
+        yield chunk.to_numpy().tolist()  # object columns: plain Python strings, no string dtype conversion
+
+def pyarrow_batches(csvfile, chunk_size):
+    """
+    Read a CSV file in record batches with pyarrow's multithreaded parser, every value as a string
+    :return: iterator over lists of rows
+    """
+    import pyarrow
+    import pyarrow.csv
+    read_options = pyarrow.csv.ReadOptions(autogenerate_column_names=True, use_threads=True,
+                                           block_size=max(chunk_size * 256, 1 << 20), encoding=csvfile.encoding or "utf8")
+    parse_options = pyarrow.csv.ParseOptions(delimiter=utils.DELIMITER, quote_char='"', newlines_in_values=True, ignore_empty_lines=False)
+    convert_options = pyarrow.csv.ConvertOptions(column_types={"f" + str(i): pyarrow.string() for i in range(MAX_COLUMNS)},
+                                                 strings_can_be_null=False, quoted_strings_can_be_null=False)
+    reader = pyarrow.csv.open_csv(csvfile.buffer, read_options=read_options, parse_options=parse_options, convert_options=convert_options)
+    for batch in reader:
+        columns = [column.to_pylist() for column in batch.columns]
+        yield [list(row) for row in zip(*columns)]
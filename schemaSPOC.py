@@ -0,0 +1,131 @@
+__author__ = 'IH'
+__project__ = 'spoc-file-processing'
+
+"""
+This schemaSPOC file resolves the column headers of each logfile to column positions once per file,
+so rows can be read as named records instead of with a cleaned_headers.index() lookup per field
+"""
+
+import collections
+import operator
+import utilsSPOC as utils
+
+class RowSchema(object):
+    """
+    The columns one logfile must have, as (record field name, column header) pairs.
+    A column header may also be a list of headers, which is read into a list.
+    """
+    name = ""
+    fields = []
+    record = None
+
+    def __init__(self, name, fields):
+        """
+        :param name: name of the record type
+        :param fields: list of (field name, utils.COL_ header or list of headers) pairs
+        :return: None
+        """
+        self.name = name
+        self.fields = fields
+        self.record = collections.namedtuple(name, [field for field, column in fields])
+
+    def compile(self, cleaned_headers, filename=""):
+        """
+        Resolve every column to its position in this file's (cleaned) headers
+        :param cleaned_headers: list of column headers as read from the file, spaces removed
+        :param filename: name of the file, for error messages
+        :return: a RowBinder for turning rows of this file into records
+        """
+        positions = {}
+        for i in range(len(cleaned_headers)-1, -1, -1):  # first occurrence wins, like list.index()
+            positions[cleaned_headers[i]] = i
+
+        missing = []
+        indices = []
+        for field, column in self.fields:
+            if isinstance(column, list):
+                missing.extend(col for col in column if col not in positions)
+                indices.append(tuple(positions.get(col) for col in column))
+            else:
+                if column not in positions:
+                    missing.append(column)
+                indices.append(positions.get(column))
+
+        if len(missing) > 0:
+            raise ValueError(filename + " is missing column(s) " + str(missing) + " for " + self.name + " records. Found: " + str(cleaned_headers))
+        return RowBinder(self, indices)
+
+class RowBinder(object):
+    """
+    A RowSchema compiled against the headers of one file: turns a row (list of strings) into a record
+    """
+    __slots__ = ('schema', 'indices', '_make', '_getter')
+
+    def __init__(self, schema, indices):
+        """
+        :param schema: the RowSchema this binder was compiled from
+        :param indices: column position of each field (a tuple of positions for list fields)
+        :return: None
+        """
+        self.schema = schema
+        self.indices = indices
+        self._make = schema.record._make
+        self._getter = None
+        if len(indices) > 1 and all(isinstance(i, int) for i in indices):
+            self._getter = operator.itemgetter(*indices)  # all scalar fields, one C-level lookup per row
+
+    def __call__(self, array_line):
+        """
+        Bind a row to a record
+        :param array_line: the row as a list of strings
+        :return: a namedtuple record of the row's fields
+        """
+        if self._getter is not None:
+            return self._make(self._getter(array_line))
+        return self._make([array_line[i] if isinstance(i, int) else [array_line[j] for j in i] for i in self.indices])
+
+    def index(self, field):
+        """
+        Column position of the given field in this file
+        :param field: record field name
+        :return: column position
+        """
+        return self.indices[self.schema.record._fields.index(field)]
+
+# one user's conditions and grades
+CONDITIONS = RowSchema("ConditionRecord", [
+    ("user_id", utils.COL_ID),
+    ("num_comments", utils.COL_NUM_COMMENTS),
+    ("voting_cond", utils.COL_VOTING),
+    ("prompting_cond", utils.COL_PROMPTS),
+    ("num_prompts", utils.COL_NUM_PROMPTS),
+    ("num_upvotes", utils.COL_NUM_UPVOTES),
+    ("num_downvotes", utils.COL_NUM_DOWNVOTES),
+    ("assignments", utils.COL_ASSIGNMENTS),
+    ("assignment_lates", utils.COL_ASSIGN_LATE),
+    ("tot_late", utils.COL_TOT_LATE),
+    ("exams", [utils.COL_E1, utils.COL_E1D, utils.COL_E1F, utils.COL_E2]),
+    ("midgrade", utils.COL_MIDGRADE),
+    ("exercises", utils.COL_EXERCISE)])
+
+# one comment posted to a lecture
+COMMENTS = RowSchema("CommentRecord", [
+    ("post_id", utils.COL_ID),
+    ("tstamp", utils.COL_TIMESTAMP),
+    ("user_id", utils.COL_AUTHOR),
+    ("ptype", utils.COL_PARENTTYPE),
+    ("parent_id", utils.COL_PARENT_ID),
+    ("slide", utils.COL_SLIDE),
+    ("comment", utils.COL_COMMENT),
+    ("num_upvotes", utils.COL_UPVOTES),
+    ("num_downvotes", utils.COL_DOWNVOTES),
+    ("edit_time", utils.COL_EDITED),
+    ("edit_user", utils.COL_EDITAUTHOR),
+    ("edit_reason", utils.COL_EDITREASON)])
+
+# one prompt sent to its recipients
+PROMPTS = RowSchema("PromptRecord", [
+    ("prompt_id", utils.COL_ID),
+    ("author_id", utils.COL_AUTHOR_ID),
+    ("recipients", utils.COL_RECIPIENTS),
+    ("timestamp", utils.COL_TSTAMP)])
@@ -0,0 +1,88 @@
+__author__ = 'IH'
+__project__ = 'spoc-file-processing'
+
+import pickle
+import tempfile
+import utilsSPOC as utils
+
+class CommentSpill(object):
+    """
+    An on-disk spill of parsed comment rows, so the comments logfile only has to be parsed once.
+    Each record is (tokens, row): the bag of words used to train the LDA model (None if the
+    comment is not used for training) and the raw row as parsed from the CSV.
+    """
+    num_rows = 0
+    num_sentences = 0
+
+    def __init__(self, directory=utils.SPILL_DIR):
+        """
+        Open a new, empty spill file
+        :param directory: directory to write the temporary spill file to (None for the system default)
+        :return: None
+        """
+        self.spill_file = tempfile.TemporaryFile(mode='w+b', dir=directory)
+        self.num_rows = 0
+        self.num_sentences = 0
+
+    def append(self, array_line, tokens=None):
+        """
+        Add one parsed row (and its training tokens) to the end of the spill
+        :param array_line: the row as a list of strings
+        :param tokens: bag of words for the LDA model, or None if this row is not used for training
+        :return: None
+        """
+        pickle.dump((tokens, array_line), self.spill_file, pickle.HIGHEST_PROTOCOL)
+        self.num_rows += 1
+        if tokens is not None:
+            self.num_sentences += 1
+
+    def records(self):
+        """
+        Replay every (tokens, row) record in the order it was added
+        :return: generator of (tokens, row) tuples
+        """
+        self.spill_file.flush()
+        self.spill_file.seek(0)
+        while True:
+            try:
+                yield pickle.load(self.spill_file)
+            except EOFError:
+                return
+
+    def rows(self):
+        """
+        Replay the parsed rows in their original order
+        :return: generator of rows (lists of strings)
+        """
+        for tokens, array_line in self.records():
+            yield array_line
+
+    def sentences(self):
+        """
+        A re-iterable view of the training bags of words, to hand to the LDA model in place of a list
+        :return: SpillSentences
+        """
+        return SpillSentences(self)
+
+    def close(self):
+        """
+        Close (and delete) the spill file
+        :return: None
+        """
+        self.spill_file.close()
+
+class SpillSentences(object):
+    """
+    Iterates over only the training bags of words in a CommentSpill. Can be iterated over
+    more than once and has a length, like the list of sentences it stands in for.
+    """
+    def __init__(self, spill):
+        self.spill = spill
+
+    def __iter__(self):
+        for tokens, array_line in self.spill.records():
+            if tokens is not None:
+                yield tokens
+
+    def __len__(self):
+        return self.spill.num_sentences
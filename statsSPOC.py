@@ -3,6 +3,7 @@ __project__ = 'spoc-file-processing'
 
 import pandas as pd
 import utilsSPOC as utils
+import columnarSPOC as columnar
 import matplotlib.pyplot as plt
 from statsmodels.formula.api import ols
 from statsmodels.graphics.api import interaction_plot
@@ -11,19 +12,19 @@ from statsmodels.stats.weightstats import ttest_ind
 
 FORMAT_LINE = utils.FORMAT_LINE
 
-def run(filename=utils.MOD_FILE+utils.FILE_EXTENSION):
+def run(filename=columnar.output_filename(utils.MOD_FILE)):
     """
     run function - coordinates the main statistical analyses
     :return: None
     """
+    conditions = [utils.COL_VOTING, utils.COL_PROMPTS]
+
     # Exception handling in case the logfile doesn't exist
     try:
-        data = pd.io.parsers.read_csv(filename, encoding="utf-8-sig")
+        data = columnar.read_table(filename, columns=conditions+[utils.COL_NUM_PROMPTS, utils.COL_NUM_COMMENTS])
     except OSError as e:
         print("ERROR: " + filename + " does not exist. Did you run logfileSPOC.py?")
 
-    conditions = [utils.COL_VOTING, utils.COL_PROMPTS]
-
     user_input = input("> Print descriptive statistics? [y/n]: ")
     if is_yes(user_input):
         descriptive_stats(data[conditions+[utils.COL_NUM_COMMENTS]].dropna())
@@ -0,0 +1,212 @@
+__author__ = 'IH'
+__project__ = 'spoc-file-processing'
+
+"""
+This syntheticSPOC file writes made-up conditions, comments and prompts logfiles with the same
+columns as the real exports, at any scale, for benchmarking and testing logfileSPOC without
+student data. Comments are spread over the lectures in utilsSPOC.lecture_dates (with some posted
+before the experiment, before their lecture, or too late to count) and use a controlled vocabulary
+of course words, LIWC sentiment words and help-seeking phrases.
+"""
+
+import argparse
+import bisect
+import csv
+import datetime
+import itertools
+import os
+import random
+import utilsSPOC as utils
+
+CONDITIONS_HEADERS = ["id", "Condition", "Num Comments", "Num Upvotes", "Num Downvotes", "Encouragement Type", "Num Times Prompted",
+                      "Asst 1", "A1 Late", "Asst 2", "A2 Late", "Asst 3", "A3 Late", "Asst 4", "A4 Late", "Total Late",
+                      "Exam 1", "Exam 1 (Deal)", "Exam 1 (Final)", "Exam 2", "Mid Grade",
+                      "Exercise 1", "Exercise 2", "Exercise 3", "Exercise 4", "Exercise 5", "Exercise 6"]
+COMMENTS_HEADERS = [utils.COL_ID, "thread", utils.COL_TIMESTAMP, utils.COL_AUTHOR, utils.COL_PARENTTYPE, utils.COL_PARENT_ID,
+                    utils.COL_SLIDE, utils.COL_COMMENT, utils.COL_UPVOTES, utils.COL_DOWNVOTES, utils.COL_EDITED,
+                    utils.COL_EDITAUTHOR, utils.COL_EDITREASON, utils.COL_ORIGINAL, ""]  # the exports end with a blank header
+PROMPTS_HEADERS = [utils.COL_ID, utils.COL_PARENTTYPE, utils.COL_PARENT_ID, utils.COL_AUTHOR_ID, utils.COL_MESSAGE, utils.COL_PROMPT_TYPE,
+                   utils.COL_ENCOURAGEMENT_TYPE, "author", utils.COL_RECIPIENTS, utils.COL_TSTAMP]
+
+COURSE_WORDS = ["thread", "lock", "cache", "memory", "parallel", "process", "schedule", "kernel", "page", "table", "disk", "file",
+                "system", "transaction", "log", "buffer", "queue", "network", "packet", "server", "client", "latency", "bandwidth",
+                "deadlock", "mutex", "semaphore", "virtual", "address", "register", "instruction", "pipeline", "branch", "slide",
+                "lecture", "example", "exam", "homework", "assignment", "proof", "algorithm"]
+FILLER_WORDS = ["the", "a", "is", "this", "that", "of", "to", "and", "in", "it", "on", "for", "why", "does", "we", "i", "you", "so", "can", "be"]
+HELP_PHRASES = ["can someone help", "i have a question", "why is this?", "i'm confused", "still struggling", "i'm lost", "stuck on this",
+                "don't know how", "dunno"]
+HTML_TAGS = [("<p>", "</p>"), ("<b>", "</b>"), ("<i>", "</i>"), ("<code>", "</code>"), ('<a href="http://example.com/notes">', "</a>")]
+
+class SyntheticSPOC(object):
+    """
+    Settings for one set of synthetic logfiles
+    """
+    def __init__(self, num_comments=1000, num_users=None, vocab_size=2000, html_fraction=0.1, help_fraction=0.1,
+                 sentiment_fraction=0.05, late_fraction=0.05, early_fraction=0.02, consent_fraction=0.5, seed=0,
+                 lexicon_dir=os.path.dirname(os.path.abspath(__file__))):
+        """
+        :param num_comments: number of comments to write
+        :param num_users: number of users (default one per 20 comments, at least 200)
+        :param vocab_size: number of distinct made-up course words, on top of the fixed course and filler words
+        :param html_fraction: fraction of comments wrapped in HTML tags
+        :param help_fraction: fraction of comments containing a help-seeking phrase
+        :param sentiment_fraction: fraction of words drawn from the LIWC positive/negative word lists
+        :param late_fraction: fraction of comments posted more than utils.WEEK_THRESHOLD weeks after their lecture
+        :param early_fraction: fraction of comments posted before their lecture (or before the experiment)
+        :param consent_fraction: fraction of users in the roster of consenting students
+        :param seed: random seed, so the same settings always write the same files
+        :param lexicon_dir: directory with positive.txt and negative.txt (no sentiment words if missing)
+        :return: None
+        """
+        self.num_comments = num_comments
+        self.num_users = num_users if num_users is not None else max(200, num_comments // 20)
+        self.html_fraction = html_fraction
+        self.help_fraction = help_fraction
+        self.sentiment_fraction = sentiment_fraction
+        self.late_fraction = late_fraction
+        self.early_fraction = early_fraction
+        self.consent_fraction = consent_fraction
+        self.random = random.Random(seed)
+
+        # Zipf-like weights, so a few words are very common, like in real comments
+        self.words = COURSE_WORDS + FILLER_WORDS + ["term" + str(i) for i in range(vocab_size)]
+        self.word_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(self.words))))
+        self.sentiment_words = []
+        for lexicon in ("positive.txt", "negative.txt"):
+            path = os.path.join(lexicon_dir, lexicon)
+            if os.path.exists(path):
+                with open(path, 'r') as f:
+                    self.sentiment_words += [word for word in f.read().split('\n') if len(word) > 0]
+
+        self.lecture_ids = [lecture_id for lecture_id, date in utils.lecture_dates]
+        self.lecture_dates = dict(utils.lecture_dates)
+        self.user_ids = list(range(1, self.num_users + 1))
+        self.consenting = sorted(self.random.sample(self.user_ids, int(self.num_users * consent_fraction)))
+
+    def write(self, directory="."):
+        """
+        Write the conditions, comments and prompts logfiles (named as in utils) and a roster of consenting students
+        :param directory: directory to write the files to (created if it doesn't exist)
+        :return: dict of file kind -> filename
+        """
+        os.makedirs(directory, exist_ok=True)
+        filenames = {"conditions": os.path.join(directory, utils.FILE_CONDITIONS + utils.FILE_EXTENSION),
+                     "comments": os.path.join(directory, utils.FILE_POSTS + utils.FILE_EXTENSION),
+                     "prompts": os.path.join(directory, utils.FILE_PROMPTS + utils.FILE_EXTENSION),
+                     "roster": os.path.join(directory, "roster.txt")}
+        self.write_conditions(filenames["conditions"])
+        self.write_comments(filenames["comments"])
+        self.write_prompts(filenames["prompts"])
+        with open(filenames["roster"], 'w') as f:
+            f.write("# consenting students\n" + "\n".join(str(uid) for uid in self.consenting) + "\n")
+        return filenames
+
+    def write_conditions(self, filename):
+        """
+        :param filename: conditions logfile to write, one row per user
+        :return: None
+        """
+        rnd = self.random
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(CONDITIONS_HEADERS)
+            for uid in self.user_ids:
+                grades = [rnd.choice(["", str(rnd.randint(40, 100))]) for i in range(4)]
+                lates = [rnd.choice(["", "", "1"]) for i in range(4)]
+                assignments = [x for pair in zip(grades, lates) for x in pair]
+                exams = [str(rnd.randint(30, 100)), rnd.choice(["", str(rnd.randint(30, 100))]), "", str(rnd.randint(30, 100))]
+                exercises = [rnd.choice(["", str(rnd.randint(0, 25))]) for i in range(6)]
+                writer.writerow([uid, rnd.choice([utils.COND_VOTE_NONE, utils.COND_VOTE_UP, utils.COND_VOTE_BOTH]), rnd.randint(0, 60),
+                                 rnd.randint(0, 20), rnd.randint(0, 5), rnd.choice([utils.COND_PROMPT_POS, utils.COND_PROMPT_NEUTRAL]),
+                                 rnd.randint(0, 6)] + assignments + [str(lates.count("1"))] + exams +
+                                [str(round(rnd.uniform(40, 100), 2))] + exercises)
+
+    def write_comments(self, filename):
+        """
+        :param filename: comments logfile to write, in id order
+        :return: None
+        """
+        rnd = self.random
+        with open(filename, 'w', encoding="utf8", newline='') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(COMMENTS_HEADERS)
+            for post_id in range(1, self.num_comments + 1):
+                lecture_id = rnd.choice(self.lecture_ids)
+                if rnd.random() < 0.001:
+                    lecture_id = max(self.lecture_ids) + 1  # a few comments are on a lecture that does not exist
+                created = self.comment_time(lecture_id)
+                edited = "0000-00-00 00:00:00"
+                if rnd.random() < 0.05:
+                    edited = (created + datetime.timedelta(minutes=rnd.randint(1, 600))).strftime('%Y-%m-%d %H:%M:%S')
+                writer.writerow([post_id, "", created.strftime('%Y-%m-%d %H:%M:%S'), rnd.choice(self.user_ids), "slide", lecture_id,
+                                 rnd.randint(1, 40), self.comment_text(), rnd.randint(0, 5), rnd.randint(0, 2), edited, "", "", "", ""])
+
+    def write_prompts(self, filename):
+        """
+        :param filename: prompts logfile to write, sorted by timestamp (one prompt per 10 comments)
+        :return: None
+        """
+        rnd = self.random
+        first_day = datetime.datetime.combine(utils.CONST_FIRST_DAY, datetime.time())
+        num_seconds = int((utils.CONST_LAST_DAY - utils.CONST_FIRST_DAY).total_seconds())
+        times = sorted(first_day + datetime.timedelta(seconds=rnd.randint(0, num_seconds)) for i in range(max(1, self.num_comments // 10)))
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(PROMPTS_HEADERS)
+            for prompt_id, timestamp in enumerate(times, 1):
+                recipients = ", ".join(str(uid) for uid in rnd.sample(self.user_ids, rnd.choice([1, 2])))
+                writer.writerow([prompt_id, "slide", rnd.choice(self.lecture_ids), 1, "Why not leave a comment?", 1,
+                                 rnd.choice([utils.COND_PROMPT_POS, utils.COND_PROMPT_NEUTRAL]), "system", recipients,
+                                 timestamp.strftime('%Y-%m-%d %H:%M:%S')])
+
+    def comment_time(self, lecture_id):
+        """
+        :param lecture_id: lecture the comment is posted to
+        :return: datetime the comment was posted: mostly within days of the lecture, sometimes before it or weeks after
+        """
+        rnd = self.random
+        posted = datetime.datetime.combine(self.lecture_dates.get(lecture_id, utils.CONST_FIRST_DAY), datetime.time())
+        draw = rnd.random()
+        if draw < self.early_fraction:
+            days = -rnd.uniform(0, 3)
+        elif draw < self.early_fraction + self.late_fraction:
+            days = rnd.uniform(7 * utils.WEEK_THRESHOLD + 1, 7 * utils.WEEK_THRESHOLD + 30)
+        else:
+            days = min(rnd.expovariate(1 / 3.0), 7 * utils.WEEK_THRESHOLD)  # most comments come in the first few days
+        return posted + datetime.timedelta(days=days)
+
+    def comment_text(self):
+        """
+        :return: the text of one comment
+        """
+        rnd = self.random
+        num_words = max(1, int(rnd.lognormvariate(2.5, 0.7)))
+        words = []
+        for i in range(num_words):
+            if len(self.sentiment_words) > 0 and rnd.random() < self.sentiment_fraction:
+                words.append(rnd.choice(self.sentiment_words))
+            else:
+                words.append(self.words[bisect.bisect(self.word_weights, rnd.random() * self.word_weights[-1])])
+        if rnd.random() < self.help_fraction:
+            words.insert(rnd.randint(0, len(words)), rnd.choice(HELP_PHRASES))
+        text = " ".join(words)
+        if rnd.random() < 0.1:
+            text += ",\nand a second line"  # real comments have commas and line breaks
+        if rnd.random() < self.html_fraction:
+            start, end = rnd.choice(HTML_TAGS)
+            text = start + text + end
+        return text
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write synthetic SPOC conditions, comments and prompts logfiles")
+    parser.add_argument('--comments', type=int, default=1000, help="number of comments")
+    parser.add_argument('--users', type=int, default=None, help="number of users (default one per 20 comments, at least 200)")
+    parser.add_argument('--vocab', type=int, default=2000, help="number of made-up course words")
+    parser.add_argument('--html', type=float, default=0.1, help="fraction of comments with HTML")
+    parser.add_argument('--seed', type=int, default=0, help="random seed")
+    parser.add_argument('--out', default=".", help="directory to write the logfiles to")
+    args = parser.parse_args()
+
+    synthetic = SyntheticSPOC(args.comments, args.users, args.vocab, args.html, seed=args.seed)
+    for kind, filename in synthetic.write(args.out).items():
+        print("Wrote " + kind + " " + filename)
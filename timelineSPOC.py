@@ -0,0 +1,161 @@
+__author__ = 'IH'
+__project__ = 'spoc-file-processing'
+
+"""
+This timelineSPOC file keeps each user's comment dates (and the dates they were prompted) as sorted
+arrays, so counts of comments in any window around the first prompt, every prompt or every lecture
+are a binary search instead of another branch for every comment
+"""
+
+import numpy as np
+
+ANCHORS = ("first_prompt", "prompts", "lectures")  # what a window's days are counted from
+
+class TimelineWindow(object):
+    """
+    A _mod column counting each user's comments from first_offset to last_offset days (inclusive)
+    after an anchor date. Negative offsets are days before it.
+    """
+    column = ""
+    anchor = "first_prompt"
+    first_offset = 0
+    last_offset = 0
+
+    def __init__(self, column, anchor="first_prompt", first_offset=0, last_offset=7):
+        """
+        :param column: header of the column in the _mod file
+        :param anchor: "first_prompt" (the user's first prompt in utils.first_prompts), "prompts" (every
+         prompt the user received) or "lectures" (every lecture posted)
+        :param first_offset: first day of the window, in days after the anchor
+        :param last_offset: last day of the window, in days after the anchor
+        :return: None
+        """
+        if anchor not in ANCHORS:
+            raise ValueError("timeline window anchor '" + anchor + "' is not one of " + str(ANCHORS))
+        if first_offset > last_offset:
+            raise ValueError("timeline window " + column + " ends before it starts")
+        self.column = column
+        self.anchor = anchor
+        self.first_offset = first_offset
+        self.last_offset = last_offset
+
+def parse_window(text):
+    """
+    Read a window from its description, "column:anchor:first offset:last offset",
+    e.g. "comments_2_days_after_any_prompt:prompts:0:2"
+    :param text: the window's description
+    :return: TimelineWindow
+    """
+    parts = text.split(":")
+    if len(parts) != 4:
+        raise ValueError("timeline window '" + text + "' is not 'column:anchor:first offset:last offset'")
+    return TimelineWindow(parts[0], parts[1], int(parts[2]), int(parts[3]))
+
+def day_number(datestamp):
+    """
+    :param datestamp: a date or datetime
+    :return: the day as an integer, so that day offsets are differences
+    """
+    if hasattr(datestamp, "date"):
+        datestamp = datestamp.date()
+    return datestamp.toordinal()
+
+def anchor_days(dates):
+    """
+    :param dates: list of dates or datetimes, e.g. when each lecture was posted
+    :return: sorted array of their day numbers, without repeats
+    """
+    return np.unique(np.array([day_number(date) for date in dates], dtype=np.int64))
+
+def count_near(days, anchors, first_offset, last_offset):
+    """
+    Count the days within a window of any of the anchors. A day near more than one anchor is only counted once.
+    :param days: sorted array of day numbers
+    :param anchors: sorted array of anchor day numbers
+    :param first_offset: first day of the window, in days after an anchor
+    :param last_offset: last day of the window, in days after an anchor
+    :return: number of days in the window of at least one anchor
+    """
+    if len(days) < 1 or len(anchors) < 1:
+        return 0
+    if len(anchors) == 1:  # one window: two binary searches
+        return int(np.searchsorted(days, anchors[0] + last_offset, side='right') - np.searchsorted(days, anchors[0] + first_offset, side='left'))
+    # the first anchor whose window hasn't ended by each day is the only one whose window can have started
+    nearest = np.searchsorted(anchors, days - last_offset, side='left')
+    has_anchor = nearest < len(anchors)
+    starts = anchors[np.minimum(nearest, len(anchors) - 1)] + first_offset
+    return int(np.count_nonzero(has_anchor & (starts <= days)))
+
+class Timelines(object):
+    """
+    Every user's comment dates and prompt dates, for one analysis window
+    """
+    comment_days = {}  # uid -> list of day numbers of each comment
+    prompt_days = {}  # uid -> list of day numbers of each prompt received
+    sorted_days = {}  # uid -> sorted array of comment_days, built when first counted
+
+    def __init__(self):
+        self.comment_days = {}
+        self.prompt_days = {}
+        self.sorted_days = {}
+
+    def add_comment(self, user_id, datestamp):
+        """
+        :param user_id: user who posted a comment
+        :param datestamp: date or datetime the comment was posted
+        :return: None
+        """
+        self.comment_days.setdefault(user_id, []).append(day_number(datestamp))
+        self.sorted_days.pop(user_id, None)
+
+    def add_prompt(self, user_id, datestamp):
+        """
+        :param user_id: user who received a prompt
+        :param datestamp: date or datetime the prompt was sent
+        :return: None
+        """
+        self.prompt_days.setdefault(user_id, []).append(day_number(datestamp))
+
+    def merge(self, other):
+        """
+        Add the comments and prompts of another Timelines (e.g., from another shard)
+        :param other: Timelines
+        :return: None
+        """
+        for user_id, days in other.comment_days.items():
+            self.comment_days.setdefault(user_id, []).extend(days)
+            self.sorted_days.pop(user_id, None)
+        for user_id, days in other.prompt_days.items():
+            self.prompt_days.setdefault(user_id, []).extend(days)
+
+    def comments(self, user_id):
+        """
+        :param user_id: a user
+        :return: sorted array of the day numbers of the user's comments
+        """
+        days = self.sorted_days.get(user_id, None)
+        if days is None:
+            days = np.sort(np.array(self.comment_days.get(user_id, []), dtype=np.int64))
+            self.sorted_days[user_id] = days
+        return days
+
+    def count(self, user_id, window, first_prompt="", lecture_days=None):
+        """
+        Count a user's comments in a window
+        :param user_id: a user
+        :param window: TimelineWindow
+        :param first_prompt: datetime of the user's first prompt, or "" if they never got one
+        :param lecture_days: anchor_days() of the lectures' posting dates, for "lectures" windows
+        :return: number of comments, or "" if the user has no anchor for the window (e.g., was never prompted)
+        """
+        if window.anchor == "first_prompt":
+            if first_prompt is None or len(str(first_prompt)) < 1:
+                return ""
+            anchors = np.array([day_number(first_prompt)], dtype=np.int64)
+        elif window.anchor == "prompts":
+            if len(self.prompt_days.get(user_id, [])) < 1:
+                return ""
+            anchors = np.unique(np.array(self.prompt_days[user_id], dtype=np.int64))
+        else:
+            anchors = lecture_days
+        return count_near(self.comments(user_id), anchors, window.first_offset, window.last_offset)
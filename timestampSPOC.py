@@ -0,0 +1,91 @@
+__author__ = 'IH'
+__project__ = 'spoc-file-processing'
+
+"""
+This timestampSPOC file decodes the fixed-format timestamps in the logfile exports
+(e.g., 2015-01-12 14:28:58) and keeps track of the rows whose timestamps can't be decoded
+"""
+
+import csv
+import datetime
+import functools
+import os
+import utilsSPOC as utils
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+@functools.lru_cache(maxsize=utils.TIMESTAMP_CACHE_SIZE)
+def parse_timestamp(tstamp):
+    """
+    Decode a timestamp from the logfiles by slicing its fixed layout, falling back to strptime
+    for anything unusual (e.g., single digit months)
+    Format: 2015-01-12 14:28:58
+    :param tstamp: string containing the timestamp
+    :return: the datetime object, or None if the string is not a valid timestamp
+    """
+    if len(tstamp) == 19 and tstamp[4] == '-' and tstamp[7] == '-' and tstamp[10] == ' ' and tstamp[13] == ':' and tstamp[16] == ':':
+        digits = tstamp[0:4] + tstamp[5:7] + tstamp[8:10] + tstamp[11:13] + tstamp[14:16] + tstamp[17:19]
+        if digits.isascii() and digits.isdigit():
+            try:
+                return datetime.datetime(int(tstamp[0:4]), int(tstamp[5:7]), int(tstamp[8:10]), int(tstamp[11:13]), int(tstamp[14:16]), int(tstamp[17:19]))
+            except ValueError:  # e.g., month 13
+                return None
+    try:
+        return datetime.datetime.strptime(tstamp, TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+
+class Quarantine(object):
+    """
+    Collects rows that can't be processed (e.g., malformed timestamps) in a CSV file, instead of
+    stopping the whole run, and counts them by the file they came from
+    """
+    filename = ""
+    append = False  # add to the rows rejected by earlier runs instead of replacing them
+    counts = {}  # source file -> number of rejected rows
+
+    def __init__(self, filename=utils.QUARANTINE_FILE, append=False):
+        """
+        :param filename: CSV file to write rejected rows to. Only created if a row is rejected.
+        :param append: keep the rows already in the file (e.g., from earlier incremental runs)
+        :return: None
+        """
+        self.filename = filename
+        self.append = append
+        self.counts = {}
+        self.file = None
+        self.writer = None
+
+    def reject(self, source, reason, array_line):
+        """
+        Write a row to the quarantine file
+        :param source: name of the file the row came from
+        :param reason: why the row was rejected
+        :param array_line: the row as a list of strings
+        :return: None
+        """
+        if self.writer is None:
+            is_new = not self.append or not os.path.exists(self.filename) or os.path.getsize(self.filename) == 0
+            self.file = open(self.filename, 'w' if is_new else 'a', encoding="utf8")
+            self.writer = csv.writer(self.file, delimiter=utils.DELIMITER, quotechar='\"', quoting=csv.QUOTE_MINIMAL, lineterminator='\n')
+            if is_new:
+                self.writer.writerow(["source", "reason", "row"])
+        self.writer.writerow([source, reason] + list(array_line))
+        self.counts[source] = self.counts.get(source, 0) + 1
+
+    def count(self, source):
+        """
+        :param source: name of a file
+        :return: number of rows rejected from that file
+        """
+        return self.counts.get(source, 0)
+
+    def close(self):
+        """
+        Close the quarantine file
+        :return: None
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.writer = None
@@ -1,10 +1,21 @@
 __author__ = 'IH'
 __project__ = 'processMOOC'
 
+import hashlib
+import inspect
+import multiprocessing
+import os
+import pickle
 import re
+import shutil
+import tempfile
+from collections import Counter
+import numpy as np
 from html.parser import HTMLParser
 from stop_words import get_stop_words
+import gensim
 from gensim import corpora, models
+import utilsSPOC as utils
 
 class LDAtopicModel(object):
     """
@@ -13,19 +24,56 @@ class LDAtopicModel(object):
     """
     number_of_topics = 1
     docs = []
+    min_count = utils.LDA_MIN_COUNT  # vocabulary filters, see utilsSPOC
+    min_docs = utils.LDA_MIN_DOCS
+    max_doc_fraction = utils.LDA_MAX_DOC_FRACTION
+    workers = utils.LDA_WORKERS  # training options, see utilsSPOC
+    passes = utils.LDA_PASSES
+    iterations = utils.LDA_ITERATIONS
+    random_state = utils.LDA_SEED
     topic_names = []
     lda = None
+    model_dir = utils.LDA_MODEL_DIR  # where trained models are saved, see utilsSPOC
+    topic_lines = []  # lines of lda_topics.csv describing each topic
     FORMAT_LINE = "--------------------"
+    TOPICS_FILE = "lda_topics.csv"
 
-    def __init__(self, nt, docs_as_bow):
+    def __init__(self, nt, docs_as_bow, min_count=utils.LDA_MIN_COUNT, min_docs=utils.LDA_MIN_DOCS, max_doc_fraction=utils.LDA_MAX_DOC_FRACTION,
+                 workers=utils.LDA_WORKERS, passes=utils.LDA_PASSES, iterations=utils.LDA_ITERATIONS, random_state=utils.LDA_SEED,
+                 model_dir=utils.LDA_MODEL_DIR):
         """
         Initialize class with documents to train the model on
         :param docs_as_bow: a list of text documents as bags of words
+        :param min_count: leave out words appearing fewer times than this in all the documents together
+        :param min_docs: leave out words in fewer documents than this
+        :param max_doc_fraction: leave out words in more than this fraction of the documents
+        :param workers: number of processes to train with (more than 1 uses ParallelLdaModel)
+        :param passes: number of passes over the documents
+        :param iterations: number of inference iterations per document
+        :param random_state: seed for training, so the same documents give the same model (None = unseeded)
+        :param model_dir: directory to load the model from if it was trained on the same documents and settings
+         before, and to save it to otherwise (None = always train, don't save)
         :return: None
         """
         self.docs = docs_as_bow
         self.number_of_topics = nt
-        self.create_lda()
+        self.min_count = min_count
+        self.min_docs = min_docs
+        self.max_doc_fraction = max_doc_fraction
+        self.workers = workers
+        self.passes = passes
+        self.iterations = iterations
+        self.random_state = random_state
+        self.model_dir = model_dir
+        self.topic_names = []  # per model, so topic names travel with a pickled model
+        self.topic_lines = []
+        model_path = None
+        if model_dir is not None:
+            model_path = os.path.join(model_dir, self.fingerprint())
+        if model_path is None or not self.load_lda(model_path):
+            self.create_lda()
+            if model_path is not None:
+                self.save_lda(model_path)
 
     def create_lda(self, use_input=False):
         """
@@ -41,20 +89,20 @@ class LDAtopicModel(object):
         if chunk_size < 1:
             chunk_size = 1  # small number of sentences
 
-        all_tokens = sum(self.docs, [])
-        # process our stop words like all our words have been processed
-        tokens_stop = []
-        for word in get_stop_words('en'):
-            tokens_stop.extend(self.to_bow(word))
-
-        tokens_once = set(word for word in set(all_tokens) if all_tokens.count(word) == 1)
-        # remove words that appear only once or are stop words
-        texts = [[word for word in sentence if word not in tokens_once and word not in tokens_stop] for sentence in self.docs]
+        # remove words that appear only once (by default) or are stop words
+        texts = self.filter_texts(self.docs)
 
-        # constructing topic model
+        # constructing topic model, streaming the documents rather than keeping a second copy of them
         dict_lda = corpora.Dictionary(texts)
-        mm_corpus = [dict_lda.doc2bow(text) for text in texts]
-        self.lda = models.ldamodel.LdaModel(corpus=mm_corpus, id2word=dict_lda, num_topics=num_topics, update_every=1, chunksize=chunk_size, passes=1)
+        mm_corpus = BowCorpus(dict_lda, texts)
+        if self.workers > 1 and not parallel_supported():
+            print("Warning: ParallelLdaModel needs gensim " + PARALLEL_GENSIM_VERSION + ".x, not " + gensim.__version__ + ". Training in one process.")
+        if self.workers > 1 and parallel_supported():
+            self.lda = ParallelLdaModel(corpus=mm_corpus, id2word=dict_lda, num_topics=num_topics, update_every=1, chunksize=chunk_size, passes=self.passes,
+                                        iterations=self.iterations, random_state=self.random_state, workers=self.workers)
+        else:
+            self.lda = models.ldamodel.LdaModel(corpus=mm_corpus, id2word=dict_lda, num_topics=num_topics, update_every=1, chunksize=chunk_size, passes=self.passes,
+                                                iterations=self.iterations, random_state=self.random_state)
         #topics = lda.print_topics(self.number_of_topics)
 
         if use_input:
@@ -76,7 +124,6 @@ class LDAtopicModel(object):
                 i += 1
         else:
             print("- Begin guessing topics -")
-            f = open('lda_topics.csv', 'w')
             i = 0
 
             # naming each topic based on top _n_ matching words
@@ -86,11 +133,116 @@ class LDAtopicModel(object):
                 self.topic_names.append(name)
 
                 # file output
-                f.write("topic_" + str(i) + ", " + name + ", " + topic[1] + "\n")
+                self.topic_lines.append("topic_" + str(i) + ", " + name + ", " + topic[1] + "\n")
                 i += 1
-            f.close()
+            self.write_topics()
         print("Done creating LDA topic model")
 
+    def fingerprint(self):
+        """
+        A hash of the training documents and every setting that changes the trained model,
+        so a saved model is only reused for the same documents and settings
+        :return: hex string
+        """
+        settings = (self.number_of_topics, self.min_count, self.min_docs, self.max_doc_fraction,
+                    self.workers, self.passes, self.iterations, self.random_state)
+        digest = hashlib.sha1(repr(settings).encode("utf8"))
+        for doc in self.docs:
+            digest.update(("\x1f".join(doc) + "\n").encode("utf8"))
+        return digest.hexdigest()
+
+    def load_lda(self, model_path):
+        """
+        Load a model saved by save_lda, with its dictionary and topic names
+        :param model_path: directory the model was saved to
+        :return: True if the model was loaded, False if there is no usable saved model
+        """
+        try:
+            lda = models.ldamodel.LdaModel.load(os.path.join(model_path, "lda.model"))
+            lda.id2word = corpora.Dictionary.load(os.path.join(model_path, "dictionary"))
+            with open(os.path.join(model_path, "topics.pkl"), 'rb') as f:
+                topics = pickle.load(f)
+        except OSError:
+            return False  # not saved: train it
+        except Exception as e:  # corrupt, or saved by an incompatible version of gensim
+            print("Warning: could not load LDA topic model from " + model_path + " (" + repr(e) + "). Training it again.")
+            shutil.rmtree(model_path, ignore_errors=True)  # so the new model is saved in its place
+            return False
+        print("Loaded LDA topic model from " + model_path)
+        self.lda = lda
+        self.topic_names = topics["topic_names"]
+        self.topic_lines = topics["topic_lines"]
+        self.write_topics()
+        return True
+
+    def save_lda(self, model_path):
+        """
+        Save the model, its dictionary and topic names to a directory, for later runs to load
+        :param model_path: directory to save the model to
+        :return: None
+        """
+        try:
+            os.makedirs(self.model_dir, exist_ok=True)
+            partial_path = tempfile.mkdtemp(dir=self.model_dir)  # renamed when complete, so a half-saved model is never loaded
+            self.lda.save(os.path.join(partial_path, "lda.model"), ignore=("id2word",))
+            self.lda.id2word.save(os.path.join(partial_path, "dictionary"))
+            with open(os.path.join(partial_path, "topics.pkl"), 'wb') as f:
+                pickle.dump({"topic_names": self.topic_names, "topic_lines": self.topic_lines}, f, pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            return  # e.g., a read-only directory: just don't save
+        try:
+            os.rename(partial_path, model_path)
+        except OSError:
+            shutil.rmtree(partial_path, ignore_errors=True)  # another run saved the same model first
+
+    def write_topics(self):
+        """
+        Write each topic's name and words to lda_topics.csv, unless it already says the same
+        :return: None
+        """
+        if len(self.topic_lines) < 1:
+            return  # topics named by the user aren't written out
+        contents = "".join(self.topic_lines)
+        try:
+            with open(self.TOPICS_FILE, 'r') as f:
+                if f.read() == contents:
+                    return
+        except OSError:
+            pass
+        with open(self.TOPICS_FILE, 'w') as f:
+            f.write(contents)
+
+    def filter_texts(self, docs):
+        """
+        Remove the stop words and the words that are too rare or too common from the documents,
+        counting every word in one pass over them
+        :param docs: the documents as bags of words (a list, or anything that can be iterated over more than once)
+        :return: FilteredTexts, a re-iterable view of the documents' bags of words without the removed words
+        """
+        word_counts = Counter()  # word -> times it appears in all documents
+        doc_counts = Counter()  # word -> number of documents it appears in
+        num_docs = 0
+        for doc in docs:
+            word_counts.update(doc)
+            doc_counts.update(set(doc))
+            num_docs += 1
+
+        max_docs = self.max_doc_fraction * num_docs
+        removed = self.stop_tokens()
+        removed.update(word for word, count in word_counts.items()
+                       if count < self.min_count or doc_counts[word] < self.min_docs or doc_counts[word] > max_docs)
+        return FilteredTexts(docs, removed, num_docs)
+
+    @classmethod
+    def stop_tokens(cls):
+        """
+        :return: set of the English stop words, processed like all our words have been processed
+        """
+        tokens_stop = set()
+        for word in get_stop_words('en'):
+            tokens_stop.update(cls.to_bow(word))
+        return tokens_stop
+
     def get_topic_name(self, topic, num_words):
         # 0.025*can + 0.023*time + 0.020*two + 0.020*work + 0.018*may + 0.017*transaction...
         all_words = topic[1].split('+')
@@ -108,10 +260,18 @@ class LDAtopicModel(object):
         :param document: the string to predict the topic for
         :return: the string topic name
         """
+        return self.bow_distribution_scores(self.to_bow(document))
+
+    def bow_distribution_scores(self, bow):
+        """
+        Acquire the topic distribution probabilities for a document already split into words
+        :param bow: the document as a bag of words (see to_bow)
+        :return: list of (topic index, probability) tuples
+        """
         if self.lda is None:
             print("ERROR in lda_topic_model.topic_distribution_scores(): Need to create_lda() before predicting topics.")
         dict_lda = getattr(self.lda, 'id2word')
-        lda_vector = self.lda[dict_lda.doc2bow(self.to_bow(document))]
+        lda_vector = self.lda[dict_lda.doc2bow(bow)]
         return lda_vector
 
     def topic_distribution_scores_list(self, document):
@@ -137,6 +297,18 @@ class LDAtopicModel(object):
         lda_vector = self.topic_distribution_scores(document)
         return self.topic_names[max(lda_vector, key=lambda item: item[1])[0]]
 
+    def topic_scores(self, bow):
+        """
+        Predict the most likely topic and the topic distribution scores for a document with one inference
+        :param bow: the document as a bag of words (see to_bow)
+        :return: (string topic name, list of topic distribution scores by index) tuple
+        """
+        lda_vector = self.bow_distribution_scores(bow)
+        list_lda = [0] * self.number_of_topics
+        for t in lda_vector:
+            list_lda[t[0]] = t[1]
+        return self.topic_names[max(lda_vector, key=lambda item: item[1])[0]], list_lda
+
     @staticmethod
     def clean_string(sentence):
         """
@@ -175,6 +347,131 @@ class LDAtopicModel(object):
         texts = [word for word in sentence.split()]  # turning each word into an item in a list
         return texts
 
+PARALLEL_GENSIM_VERSION = "4"  # major version of gensim whose LdaModel internals ParallelLdaModel relies on
+
+class FilteredTexts(object):
+    """
+    Iterates over documents without some of their words, filtering each document as it's read.
+    Can be iterated over more than once and has a length, like the list of documents it stands in for.
+    """
+    def __init__(self, docs, removed, num_docs):
+        self.docs = docs
+        self.removed = removed
+        self.num_docs = num_docs
+
+    def __iter__(self):
+        removed = self.removed
+        for doc in self.docs:
+            yield [word for word in doc if word not in removed]
+
+    def __len__(self):
+        return self.num_docs
+
+class BowCorpus(object):
+    """
+    Iterates over documents as gensim bags of words, converting each one as it's read, once for each
+    training pass. Can be iterated over more than once and has a length, like a list corpus.
+    """
+    def __init__(self, dictionary, texts):
+        self.dictionary = dictionary
+        self.texts = texts
+
+    def __iter__(self):
+        for text in self.texts:
+            yield self.dictionary.doc2bow(text)
+
+    def __len__(self):
+        return len(self.texts)
+
+def parallel_supported():
+    """
+    ParallelLdaModel calls LdaModel.inference(chunk, collect_sstats=True) itself and sets expElogbeta, alpha
+    and random_state on a bare LdaModel, so it only works with the gensim versions those are known for
+    :return: True if the installed gensim has them
+    """
+    if gensim.__version__.split(".")[0] != PARALLEL_GENSIM_VERSION:
+        return False
+    return "collect_sstats" in inspect.signature(models.ldamodel.LdaModel.inference).parameters
+
+class ParallelLdaModel(models.ldamodel.LdaModel):
+    """
+    gensim's LdaModel, with the E-step of each chunk split over a pool of processes. Unlike gensim's
+    LdaMulticore, each piece of a chunk is seeded from the model's random_state and the pieces' statistics
+    are added up in order, so the same seed and number of workers always train the same model.
+    """
+    workers = 1
+    pool = None  # only open while training
+
+    def __init__(self, *args, workers=2, **kwargs):
+        """
+        Train the model, with the same arguments as gensim's LdaModel
+        :param workers: number of processes to run the E-step in
+        :return: None
+        """
+        if not parallel_supported():
+            raise RuntimeError("ParallelLdaModel needs gensim " + PARALLEL_GENSIM_VERSION + ".x, not " + gensim.__version__)
+        self.workers = workers
+        self.pool = None
+        try:
+            super().__init__(*args, **kwargs)
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool.join()
+                self.pool = None
+
+    def do_estep(self, chunk, state=None):
+        """
+        Infer the topics of a chunk of documents in the pool, and add up their sufficient statistics
+        :param chunk: list of documents as bags of (word id, count)
+        :param state: LdaState to add the statistics to (default the model's)
+        :return: gamma of the chunk's documents
+        """
+        if self.pool is None and self.workers > 1:
+            self.pool = multiprocessing.Pool(self.workers, initializer=init_estep_worker, initargs=(self.num_topics, self.iterations, self.gamma_threshold, self.dtype))
+        chunk = list(chunk)
+        if self.pool is None or len(chunk) < 2:
+            return super().do_estep(chunk, state)
+        if state is None:
+            state = self.state
+
+        piece_size = -(-len(chunk) // self.workers)  # round up
+        pieces = [chunk[i:i+piece_size] for i in range(0, len(chunk), piece_size)]
+        seeds = self.random_state.randint(0, 2**31 - 1, size=len(pieces))  # drawn in order, so a seeded model is repeatable
+        results = self.pool.map(estep_piece, [(piece, int(seed), self.alpha, self.expElogbeta) for piece, seed in zip(pieces, seeds)])
+
+        for gamma, sstats in results:
+            state.sstats += sstats
+        gamma = np.concatenate([gamma for gamma, sstats in results])
+        state.numdocs += gamma.shape[0]
+        return gamma
+
+estep_lda = None  # the E-step worker's model, only its inference settings and current topics are used
+
+def init_estep_worker(num_topics, iterations, gamma_threshold, dtype):
+    """
+    Set up an E-step worker process with the model's inference settings
+    :return: None
+    """
+    global estep_lda
+    estep_lda = models.ldamodel.LdaModel.__new__(models.ldamodel.LdaModel)
+    estep_lda.num_topics = num_topics
+    estep_lda.iterations = iterations
+    estep_lda.gamma_threshold = gamma_threshold
+    estep_lda.dtype = dtype
+
+def estep_piece(job):
+    """
+    Infer the topics of one piece of a chunk with the model's current topics
+    :param job: (documents, seed, alpha, expElogbeta) tuple
+    :return: (gamma, sufficient statistics) tuple
+    """
+    piece, seed, alpha, expElogbeta = job
+    estep_lda.random_state = np.random.RandomState(seed)
+    estep_lda.alpha = alpha
+    estep_lda.expElogbeta = expElogbeta
+    return estep_lda.inference(piece, collect_sstats=True)
+
 class MLStripper(HTMLParser):
     """
     A class for stripping HTML tags from a string
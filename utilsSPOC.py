@@ -22,9 +22,36 @@ MOD_FILE = FILE_CONDITIONS + "_mod"
 LDA_FILE = FILE_POSTS + "_lda"
 MT_FILE = "_mid"  # file extension for second half of class only
 FILE_EXTENSION = ".csv"
+OUTPUT_FORMAT = "csv"  # format of the _mod, _lda and _prompts_mod files: "csv", "parquet" or "feather"
+OUTPUT_COMPRESSION = ""  # added to the CSV output file names to compress them: "", ".gz", ".bz2", ".xz" or ".zst"
+CSV_READER = "csv"  # parser for the logfiles: "csv", "pandas" (in chunks) or "pyarrow" (multithreaded record batches)
+CSV_CHUNK_SIZE = 10000  # number of rows the "pandas" and "pyarrow" readers parse at a time
+IO_BUFFER_SIZE = 1 << 20  # bytes read or written at a time, compressed or not
+CHECKPOINT_FILE = "spoc_checkpoint.pkl"  # state saved between incremental runs
+QUARANTINE_FILE = "spoc_quarantine.csv"  # rows that couldn't be processed (e.g., malformed timestamps)
+DIAGNOSTICS_FILE = None  # JSON report of the warnings from each stage (None = only print a summary)
+TIMINGS_FILE = None  # JSON report of the time (and memory) each stage took (None = only print a summary)
+PROFILE_FILE = None  # cProfile stats of the whole run (None = don't profile)
+TRACE_MEMORY = False  # record each stage's peak memory with tracemalloc (slows the run down)
 DELIMITER = ","
 NUM_LDA_TOPICS = 15
+LDA_MIN_COUNT = 2  # leave words out of the LDA model that appear fewer times than this in all the comments together
+LDA_MIN_DOCS = 1  # leave words out of the LDA model that are in fewer comments than this
+LDA_MAX_DOC_FRACTION = 1.0  # leave words out of the LDA model that are in more than this fraction of the comments
+LDA_WORKERS = 1  # processes to train the LDA model with (1 = gensim's single-process LdaModel, more = topicModelLDA.ParallelLdaModel)
+LDA_PASSES = 1  # passes over the comments when training the LDA model
+LDA_ITERATIONS = 50  # inference iterations per comment when training the LDA model
+LDA_SEED = None  # random_state for training the LDA model, for the same topics on every run (None = different each run)
+LDA_MODEL_DIR = None  # e.g., "lda_models": save trained LDA models by a fingerprint of their comments and settings, for later runs to reuse (never pruned; None = always train)
 WEEK_THRESHOLD = 3  # threshhold num weeks after a lecture for comment to be considered 'punctual'
+SCORING_CHUNK_SIZE = 500  # number of comments sent to a scoring worker at a time
+TIMESTAMP_CACHE_SIZE = 65536  # number of recently decoded timestamps to remember
+DIAGNOSTIC_SAMPLES = 5  # number of example warnings to print for each kind of warning
+ANALYSIS_WINDOWS = None  # windows to compute from one parse, e.g. ["full", "mid"] (see windowSPOC.parse_window; None = only the one is_only_second_half picks)
+TIMELINE_WINDOWS = []  # extra _mod columns counting comments around prompts or lectures, e.g. ["comments_2_days_after_any_prompt:prompts:0:2"] (see timelineSPOC.parse_window)
+LEXICON_DIR = None  # directory of positive.txt and negative.txt (None = the working directory if they're there, otherwise the package's)
+LEXICON_CACHE = "lexicons.pkl"  # parsed lexicons, saved next to them for later runs (None = don't cache)
+SPILL_DIR = None  # directory for the temporary comment spill file when streaming (None = system temp directory)
 
 # student issues
 DROP_STUDENTS = [15, 78, 105, 133, 181]
@@ -35,6 +62,8 @@ CONSENTING_STUDENTS = [9, 10, 13, 14, 15, 16, 17, 20, 21, 23, 29, 34, 37, 41, 42
                        108, 109, 115, 117, 119, 121, 123, 127, 128, 131, 133, 134, 136, 145, 151, 152, 153, 160, 164,
                        165, 180, 181, 182]
 # IDs of all the consenting students
+ROSTER_FILE = None  # file of consenting student IDs to use instead of CONSENTING_STUDENTS (None = use the list above)
+DROP_FILE = None  # file of dropped student IDs to use instead of DROP_STUDENTS (None = use the list above)
 
 # column headers (as written in the in-file)
 # Note: I've removed the spaces from all of these at read-in.
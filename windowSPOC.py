@@ -0,0 +1,89 @@
+__author__ = 'IH'
+__project__ = 'spoc-file-processing'
+
+"""
+This windowSPOC file defines the analysis windows (e.g., the full term, or only the second half
+after the midterm) that logfileSPOC can compute outputs for, all from one parse of the logfiles
+"""
+
+import datetime
+import utilsSPOC as utils
+
+class AnalysisWindow(object):
+    """
+    A range of dates to count comments and prompts in, with the suffix its output files get
+    """
+    suffix = ""  # added to the _mod, _lda and _prompts_mod file names, e.g. utils.MT_FILE
+    first_day = None  # first date in the window (None = no start)
+    last_day = None  # last date in the window (None = no end)
+
+    def __init__(self, suffix, first_day=None, last_day=None):
+        """
+        :param suffix: added to the output file names, must be different for each window in a run
+        :param first_day: first date in the window, inclusive (None = from the beginning)
+        :param last_day: last date in the window, inclusive (None = to the end)
+        :return: None
+        """
+        self.suffix = suffix
+        self.first_day = first_day
+        self.last_day = last_day
+
+    def contains(self, date):
+        """
+        :param date: a date
+        :return: True if the date is in this window
+        """
+        if self.first_day is not None and date < self.first_day:
+            return False
+        if self.last_day is not None and date > self.last_day:
+            return False
+        return True
+
+    def is_bounded(self):
+        """
+        :return: True if some dates are outside of this window
+        """
+        return self.first_day is not None or self.last_day is not None
+
+    def definition(self):
+        """
+        :return: (suffix, first day, last day) tuple, to compare windows between runs
+        """
+        return self.suffix, self.first_day, self.last_day
+
+    def __repr__(self):
+        return "AnalysisWindow(" + repr(self.suffix) + ", " + str(self.first_day) + ", " + str(self.last_day) + ")"
+
+FULL_TERM = AnalysisWindow("")
+SECOND_HALF = AnalysisWindow(utils.MT_FILE, utils.CONST_MIDTERM + datetime.timedelta(days=1))  # only after the midterm
+NAMED_WINDOWS = {"full": FULL_TERM, "mid": SECOND_HALF}
+
+def parse_window(text):
+    """
+    Read a window from the command line: "full", "mid", or "suffix:first day:last day" with
+    dates as YYYY-MM-DD (either can be left empty), e.g. "_feb:2015-02-01:2015-02-28"
+    :param text: the window's description
+    :return: AnalysisWindow
+    """
+    if text in NAMED_WINDOWS:
+        return NAMED_WINDOWS[text]
+    parts = text.split(":")
+    if len(parts) != 3:
+        raise ValueError("analysis window '" + text + "' is not 'full', 'mid' or 'suffix:first day:last day'")
+    suffix, first_day, last_day = parts
+    days = []
+    for day in (first_day, last_day):
+        days.append(datetime.datetime.strptime(day, '%Y-%m-%d').date() if len(day) > 0 else None)
+    return AnalysisWindow(suffix, days[0], days[1])
+
+def check_windows(windows):
+    """
+    Make sure a run's windows will write to different files
+    :param windows: list of AnalysisWindow
+    :return: None
+    """
+    if len(windows) < 1:
+        raise ValueError("no analysis windows to compute")
+    suffixes = [window.suffix for window in windows]
+    if len(set(suffixes)) != len(suffixes):
+        raise ValueError("analysis windows must have different file suffixes: " + str(suffixes))